@@ -0,0 +1,268 @@
+"""
+.. module:: benchmark
+
+Benchmark of the simulation engine (see :py:mod:`flock`): how long the neighbour search, every rule and a full step take,
+for different numbers of birds, dimensions and densities of birds.
+The results are written as JSON, so they can be compared between versions or computers.
+
+Birds are placed uniformly in a container whose size is chosen to get the wanted density,
+which is given as the average number of birds closer than :py:data:`parameters.GROUP_DIST` to a bird.
+
+It can also be executed from the command line, for example::
+
+    python benchmark.py --birds 30,1000,100000 --dim 2,3 --density 5,50 --out results.json
+"""
+
+import parameters as param
+import flock
+import kernels
+import neighbours
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def container(n: int, dim: int, density: float, config):
+    """
+    Computes the configuration of a benchmark, with a container where birds have a given density.
+    The attraction and repulsion points are scaled with the container.
+
+    :param n: number of birds.
+    :type n: int
+    :param dim: dimension of the simulation.
+    :type dim: int
+    :param density: average number of birds closer than :py:data:`parameters.GROUP_DIST` to a bird.
+    :type density: float
+    :param config: parameters of the simulation, whose container is replaced.
+    :type config: :class:`parameters.Config`
+    :return: the configuration.
+    :rtype: :class:`parameters.Config`
+
+    |
+    """
+
+    # Volume of a ball (area of a circle in 2D) of radius GROUP_DIST
+    ball = math.pi**(dim/2) / math.gamma(dim/2 + 1) * config.GROUP_DIST**dim
+    half = (n*ball/density)**(1/dim) / 2
+    scale = half / config.X_MAX
+
+    return config.replace(DIM=dim, NUM_BIRDS=n,
+                          X_MIN=-half, X_MAX=half, Y_MIN=-half, Y_MAX=half, Z_MIN=-half, Z_MAX=half,
+                          ATTRACTION_POINTS=[tuple(scale*x for x in point[:dim]) for point in config.ATTRACTION_POINTS],
+                          REPULSION_POINTS=[tuple(scale*x for x in point[:dim]) for point in config.REPULSION_POINTS])
+
+
+def randomFlock(n: int, rng, config, position=None, type: int = 1):
+    """
+    Generates birds with random positions (uniformly distributed in the container), directions and speeds.
+
+    :param n: number of birds.
+    :type n: int
+    :param rng: random generator.
+    :type rng: numpy.random.Generator
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param position: coordinates of the birds, defaults to None (random).
+    :type position: numpy.ndarray, optional
+    :param type: type of the birds, defaults to 1.
+    :type type: int, optional
+    :return: the birds.
+    :rtype: :class:`flock.Flock`
+
+    |
+    """
+
+    if position is None:
+        position = rng.uniform(config.LOWER, config.UPPER, (n, config.DIM))
+    direction = rng.standard_normal((n, config.DIM))
+    direction /= flock.norm(direction)[:, None]
+    speed = rng.integers(config.MIN_VEL, config.MAX_VEL, n, endpoint=True).astype(float)
+
+    return flock.Flock(np.array(position, dtype=float).reshape(n, config.DIM), direction, speed, type)
+
+
+def timeit(function, repeat: int):
+    """
+    Measures how long a function takes.
+
+    :param function: function without arguments.
+    :type function: function
+    :param repeat: number of times it is executed.
+    :type repeat: int
+    :return: the shortest time, in seconds.
+    :rtype: float
+
+    |
+    """
+
+    best = math.inf
+    for k in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def phases(birds, attraction_points, repulsion_points, config):
+    """
+    Builds the functions that run every phase of a step separately, as :func:`flock.step` runs them.
+    They do not change the birds, but the attraction and repulsion points are updated.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: functions without arguments, by name of the phase.
+    :rtype: dict
+
+    |
+    """
+
+    position, direction = birds.position, birds.direction
+    radii = (config.GROUP_DIST, config.MIN_DIST, min(config.VIEW_DIST, config.GROUP_DIST))
+    out = [birds.group_birds, birds.close_neighbours, birds.view_birds]
+
+    grid = neighbours.SpatialGrid(position, config, groups=birds.groups)
+    group_birds, close_neighbours, view_birds = grid.query(position, radii, exclude_self=True, groups=birds.groups, out=out)
+
+    avoidance, center, copy, view = flock.rules()
+
+    return {
+        'grid': lambda: neighbours.SpatialGrid(position, config, groups=birds.groups),
+        'neighbours': lambda: grid.query(position, radii, exclude_self=True, groups=birds.groups, out=out),
+        'avoidance': lambda: avoidance(direction, close_neighbours, config),
+        'center': lambda: center(position, direction, group_birds, config),
+        'copy': lambda: copy(direction, direction, group_birds, config),
+        'view': lambda: view(direction, view_birds, config),
+        'attraction': lambda: flock.attraction(position, direction, attraction_points.position, config),
+        'repulsion': lambda: flock.repulsion(position, direction, repulsion_points.position, config),
+        'points': lambda: flock.updatePoints(attraction_points, repulsion_points, birds, config),
+    }
+
+
+def benchmark(n: int, dim: int, density: float, n_steps: int = 5, repeat: int = 3, seed: int = 0, config=None):
+    """
+    Runs the benchmark of one number of birds, dimension and density.
+
+    :param n: number of birds.
+    :type n: int
+    :param dim: dimension of the simulation.
+    :type dim: int
+    :param density: average number of birds closer than :py:data:`parameters.GROUP_DIST` to a bird.
+    :type density: float
+    :param n_steps: number of full steps that are timed, defaults to 5.
+    :type n_steps: int, optional
+    :param repeat: number of times every phase is timed (the shortest time is kept), defaults to 3.
+    :type repeat: int, optional
+    :param seed: seed of the random positions and velocities, defaults to 0.
+    :type seed: int, optional
+    :param config: parameters of the simulation, whose container is replaced, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
+    :return: the results: size of the container, steps per second, time of every phase (in seconds) and peak memory of a step (in bytes).
+    :rtype: dict
+
+    |
+    """
+
+    config = container(n, dim, density, config or param.Config())
+    rng = np.random.default_rng(seed)
+
+    birds = randomFlock(n, rng, config)
+    attraction_points = randomFlock(len(config.ATTRACTION_POINTS), rng, config, config.ATTRACTION_POINTS, type=-1)
+    repulsion_points = randomFlock(len(config.REPULSION_POINTS), rng, config, config.REPULSION_POINTS, type=-2)
+
+    # Warm up (buffers of the neighbour lists are allocated in the first step)
+    flock.step(birds, attraction_points, repulsion_points, config)
+
+    times = {name: timeit(function, repeat) for name, function in phases(birds, attraction_points, repulsion_points, config).items()}
+
+    start = time.perf_counter()
+    for i in range(n_steps):
+        flock.step(birds, attraction_points, repulsion_points, config)
+    elapsed = time.perf_counter() - start
+    times['step'] = elapsed / n_steps
+
+    # Memory is measured apart, as tracing allocations slows down the step
+    tracemalloc.start()
+    flock.step(birds, attraction_points, repulsion_points, config)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'NUM_BIRDS': n,
+        'DIM': dim,
+        'density': density,
+        'container': 2*config.X_MAX,
+        'group_birds': float(birds.group_birds.counts().mean()),
+        'steps_per_second': n_steps / elapsed,
+        'phases': times,
+        'peak_memory': peak,
+    }
+
+
+def parse_list(type):
+    """
+    Builds a function that reads a list of values written in the command line, separated by commas.
+
+    :param type: type of the values.
+    :type type: type
+    :return: the function.
+    :rtype: function
+
+    |
+    """
+
+    def parse(text):
+        try:
+            return [type(value) for value in text.split(',')]
+        except ValueError:
+            raise argparse.ArgumentTypeError('invalid list: {}'.format(text))
+    return parse
+
+
+def main():
+    """
+    Runs the benchmark from the command line, for every combination of number of birds, dimension and density.
+
+    |
+    """
+
+    parser = argparse.ArgumentParser(description='Benchmark the bird flock simulation.')
+    parser.add_argument('--birds', type=parse_list(int), default=[30, 100, 1000, 10000, 100000], metavar='N,N,...',
+                        help='numbers of birds')
+    parser.add_argument('--dim', type=parse_list(int), default=[2, 3], metavar='DIM,DIM,...', help='dimensions')
+    parser.add_argument('--density', type=parse_list(float), default=[5, 50], metavar='D,D,...',
+                        help='average numbers of birds closer than GROUP_DIST to a bird')
+    parser.add_argument('--steps', type=int, default=5, help='number of full steps that are timed')
+    parser.add_argument('--repeat', type=int, default=3, help='number of times every phase is timed')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random positions and velocities')
+    parser.add_argument('--out', type=argparse.FileType('w'), default=sys.stdout, help='JSON file for the results')
+    args = parser.parse_args()
+
+    results = []
+    for dim in args.dim:
+        for density in args.density:
+            for n in args.birds:
+                results.append(benchmark(n, dim, density, args.steps, args.repeat, args.seed))
+                print('DIM={} density={} {} birds: {:.1f} steps/s'.format(dim, density, n, results[-1]['steps_per_second']),
+                      file=sys.stderr)
+
+    json.dump({'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+               'compiled_rules': kernels.ENABLED, 'results': results},
+              args.out, indent=2)
+    args.out.write('\n')
+
+
+if __name__ == "__main__":
+    main()
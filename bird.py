@@ -6,13 +6,92 @@ Here is defined the structure of a bird in the simulation.
 
 import parameters as param
 import math
-import statistics
 import copy
+import functools
+
+import numpy as np
+
+
+def bounds():
+    """
+    Gives the limits, for every coordinate, of the region where birds can be, as given by the boundary conditions
+    (the same as ``LOWER`` and ``UPPER`` in :class:`parameters.Config`, from the values in :py:mod:`parameters`).
+
+    :return: lower and upper limits, as arrays.
+    :rtype: tuple
+
+    |
+    """
+
+    return _bounds(param.DIM, param.X_MIN, param.X_MAX, param.Y_MIN, param.Y_MAX, param.Z_MIN, param.Z_MAX, param.BOUNDARY_DELTA)
+
+
+@functools.lru_cache(maxsize=8)
+def _bounds(dim, x_min, x_max, y_min, y_max, z_min, z_max, boundary_delta):
+    lower = np.array([x_min + boundary_delta, y_min + boundary_delta, z_min - boundary_delta][:dim], dtype=float)
+    upper = np.array([x_max - boundary_delta, y_max - boundary_delta, z_max + boundary_delta][:dim], dtype=float)
+    lower.flags.writeable = False
+    upper.flags.writeable = False
+    return lower, upper
+
+
+def _positions(birds: list):
+    # Coordinates of some birds, as an array with shape (len(birds), DIM)
+    return np.array([bird._position for bird in birds], dtype=float).reshape(len(birds), param.DIM)
+
+
+def _directions(birds: list):
+    # Directions of some birds, as an array with shape (len(birds), DIM)
+    return np.array([bird._direction for bird in birds], dtype=float).reshape(len(birds), param.DIM)
+
+
+def distancesSquared(points: list, all_birds: list):
+    """
+    Computes the squared distances from some points to all birds at once, as a matrix.
+
+    :param points: the points, represented as instances of the :class:`bird.Bird` class.
+    :type points: list
+    :param all_birds: all the birds in the simulation, represented as instances of the :class:`bird.Bird` class.
+    :type all_birds: list
+    :return: squared distances, with shape (P, N).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    dist = _positions(all_birds)[None, :, :] - _positions(points)[:, None, :]
+    return np.einsum('ijk,ijk->ij', dist, dist)
+
+
+def updatePoints(attraction_points: list, repulsion_points: list, all_birds: list):
+    """
+    Updates all attraction points (see :meth:`Bird.updateAttractor`) and then all repulsion points (see :meth:`Bird.updateRepulsor`),
+    with the distances from every point to every bird computed at once, before any point moves.
+
+    :param attraction_points: the attraction points, represented as instances of the :class:`bird.Bird` class.
+    :type attraction_points: list
+    :param repulsion_points: the repulsion points, represented as instances of the :class:`bird.Bird` class.
+    :type repulsion_points: list
+    :param all_birds: all the birds in the simulation, represented as instances of the :class:`bird.Bird` class.
+    :type all_birds: list
+
+    |
+    """
+
+    dist_sq = distancesSquared(list(attraction_points) + list(repulsion_points), all_birds)
+
+    for point, row in zip(attraction_points, dist_sq):
+        point.updateAttractor(all_birds, row)
+    for point, row in zip(repulsion_points, dist_sq[len(attraction_points):]):
+        point.updateRepulsor(all_birds, row)
 
 
 class Bird:
     """
-    The class that represents a bird.
+    The class that represents a bird. It is the reference of the rules, applied to one bird at a time;
+    large simulations use :py:mod:`flock`, which applies them to all birds at once.
+    Its state is kept in arrays, so a bird can be a view of a row of a :class:`flock.Flock` (see :meth:`fromFlock`), whose changes it shares.
+    It has no per-instance dictionary, so no other attributes can be added to it.
 
     :param index: index that identifies bird.
     :type index: int
@@ -28,6 +107,8 @@ class Bird:
     |
     """
 
+    __slots__ = ('index', 'type', 'previous_vel', '_position', '_direction', '_speed', '_row', '_vel', '_outside')
+
     def __init__(self, index: int, position: list, direction: list, speed: float, type: int):
         """
         Constructor for the bird class.
@@ -36,11 +117,96 @@ class Bird:
         """
     
         self.index = index
-        self.position = position
-        self.direction = direction
-        self.speed = speed
-        self.previous_vel = 0
+        self._position = np.array(position, dtype=float)
+        self._direction = np.array(direction, dtype=float)
+        self._speed = np.array([speed], dtype=float)
+        self._row = 0
         self.type = type    # 1 if bird, -1 if attraction point, -2 if repulsion point
+        self._allocate()
+
+
+    @classmethod
+    def fromFlock(cls, flock, row: int, index: int = None):
+        """
+        Builds a bird that is a view of a row of a flock: it reads and writes the arrays of the flock, without copying them.
+
+        :param flock: the flock.
+        :type flock: :class:`flock.Flock`
+        :param row: number of the row of the bird in the flock.
+        :type row: int
+        :param index: index that identifies bird, defaults to the number of the row.
+        :type index: int, optional
+        :return: the bird.
+        :rtype: :class:`bird.Bird`
+
+        |
+        """
+
+        bird = cls.__new__(cls)
+        bird.index = row if index is None else index
+        bird._position = flock.position[row]
+        bird._direction = flock.direction[row]
+        bird._speed = flock.speed
+        bird._row = row
+        bird.type = flock.type
+        bird._allocate()
+        return bird
+
+
+    def _allocate(self):
+        # Buffers of the updates, which belong to every bird so that birds can be updated from several threads
+        dim = len(self._position)
+        self.previous_vel = np.zeros(dim)
+        self._vel = np.zeros((2, dim))
+        self._outside = np.zeros((2, dim), dtype=bool)
+
+
+    @property
+    def position(self):
+        """
+        Coordinates (x,y,z) of bird, as an array. Assigning a list to it changes the coordinates in place.
+
+        |
+        """
+
+        return self._position
+
+
+    @position.setter
+    def position(self, value):
+        self._position[:] = value
+
+
+    @property
+    def direction(self):
+        """
+        Direction of bird's velocity vector, as an array. Assigning a list to it changes the direction in place.
+
+        |
+        """
+
+        return self._direction
+
+
+    @direction.setter
+    def direction(self, value):
+        self._direction[:] = value
+
+
+    @property
+    def speed(self):
+        """
+        Module of bird's velocity vector.
+
+        |
+        """
+
+        return float(self._speed[self._row])
+
+
+    @speed.setter
+    def speed(self, value):
+        self._speed[self._row] = value
 
 
     def updatePos(self, diff_time):
@@ -54,27 +220,17 @@ class Bird:
         |
         """
 
-        new_pos = [self.position[i] + self.speed*self.direction[i]*diff_time for i in range(param.DIM)]
-
-        # Apply boundary conditions
-        if new_pos[0] < param.X_MIN + param.BOUNDARY_DELTA:
-            new_pos[0] = param.X_MAX - param.BOUNDARY_DELTA
-        elif new_pos[0] > param.X_MAX - param.BOUNDARY_DELTA:
-            new_pos[0] = param.X_MIN + param.BOUNDARY_DELTA
-        
-        if new_pos[1] < param.Y_MIN + param.BOUNDARY_DELTA:
-            new_pos[1] = param.Y_MAX - param.BOUNDARY_DELTA
-        elif new_pos[1] > param.Y_MAX - param.BOUNDARY_DELTA:
-            new_pos[1] = param.Y_MIN + param.BOUNDARY_DELTA
-
-        if param.DIM == 3:
-            if new_pos[2] < param.Z_MIN - param.BOUNDARY_DELTA:
-               new_pos[2] = param.Z_MAX + param.BOUNDARY_DELTA
-            elif new_pos[2] > param.Z_MAX + param.BOUNDARY_DELTA:
-               new_pos[2] = param.Z_MIN - param.BOUNDARY_DELTA
-        
-        for i in range(param.DIM):
-            self.position[i] = new_pos[i]
+        move, outside = self._vel[0], self._outside
+        np.multiply(self._direction, self.speed, out=move)
+        move *= diff_time
+        self._position += move
+
+        # Apply boundary conditions (both sides are found before the bird is moved)
+        lower, upper = bounds()
+        np.less(self._position, lower, out=outside[0])
+        np.greater(self._position, upper, out=outside[1])
+        np.copyto(self._position, upper, where=outside[0])
+        np.copyto(self._position, lower, where=outside[1])
 
 
     def avoidance(self, neighbours: list):
@@ -84,7 +240,7 @@ class Bird:
         :param neighbours: birds that are closer to the bird than the minimum distance (see :py:data:`MIN_DIST` in :py:mod:`parameters`). Birds are represented as instances of the :class:`bird.Bird` class.
         :type neighbours: list
         :return: velocity vector that responds to the Avoidance rule.
-        :rtype: list
+        :rtype: numpy.ndarray
 
         |
         """
@@ -92,25 +248,11 @@ class Bird:
         if len(neighbours) == 0:
             return self.direction
         else:
-            avoidance_vel = [0]*param.DIM
-
-            for i in range(len(neighbours)):
-                dist = [neighbours[i].position[j]-self.position[j] for j in range(param.DIM)]
-                
-                if param.DIM == 2:
-                    mod_dist = math.sqrt(dist[0]**2+dist[1]**2)
-                elif param.DIM == 3:
-                    mod_dist = math.sqrt(dist[0]**2+dist[1]**2+dist[2]**2)
-                    
-                dist = [dist[i]/mod_dist for i in range(param.DIM)]
-
-                for j in range(param.DIM):
-                    avoidance_vel[j] += (param.MIN_DIST - mod_dist)*dist[j]
+            dist = _positions(neighbours) - self._position
+            mod_dist = np.sqrt(np.einsum('ij,ij->i', dist, dist))
 
-            for j in range(param.DIM):
-                avoidance_vel[j] *= (-1/len(neighbours))
-
-            return avoidance_vel
+            # Every neighbour pushes the bird along the unit vector between them, by how much it is inside the minimum distance
+            return -(((param.MIN_DIST - mod_dist)/mod_dist) @ dist)/len(neighbours)
 
 
     def center(self, group_birds: list):
@@ -121,7 +263,7 @@ class Bird:
         :param group_birds: birds that are closer to the bird than the group boundary distance (see :py:data:`GROUP_DIST` in :py:mod:`parameters`). Birds are represented as instances of the :class:`bird.Bird` class.
         :type group_birds: list
         :return: velocity vector that responds to the Center rule.
-        :rtype: list
+        :rtype: numpy.ndarray
 
         |
         """
@@ -129,9 +271,8 @@ class Bird:
         if len(group_birds) == 0:
             return self.direction
         else:
-            center = [statistics.mean([bird.position[i] for bird in group_birds]) for i in range(param.DIM)]
-            vel_center = [center[i] - self.position[0] for i in range(param.DIM)]
-            return vel_center
+            # Every coordinate of the center is measured from the bird's first coordinate
+            return _positions(group_birds).mean(axis=0) - self._position[0]
 
 
     def copy(self, group_birds: list):
@@ -141,7 +282,7 @@ class Bird:
         :param group_birds: birds that are closer to the bird than the group boundary distance (see :py:data:`GROUP_DIST` in :py:mod:`parameters`). Birds are represented as instances of the :class:`bird.Bird` class.
         :type group_birds: list
         :return: velocity vector that responds to the Copy rule.
-        :rtype: list
+        :rtype: numpy.ndarray
 
         |
         """
@@ -149,16 +290,7 @@ class Bird:
         if len(group_birds) == 0:
             return self.direction
         else:
-            avg_direction =[0]*param.DIM
-
-            for i in range(len(group_birds)):
-                for j in range(param.DIM):
-                    avg_direction[j] += group_birds[i].direction[j]
-    
-            for j in range(param.DIM):
-                avg_direction[j] = avg_direction[j]/len(group_birds)
-
-            return avg_direction
+            return _directions(group_birds).mean(axis=0)
 
 
     def view(self, group_birds: list):
@@ -168,82 +300,59 @@ class Bird:
         :param group_birds: birds that are closer to the bird than the group boundary distance (see :py:data:`GROUP_DIST` in :py:mod:`parameters`). Birds are represented as instances of the :class:`bird.Bird` class.
         :type group_birds: list
         :return: velocity vector that responds to the View rule.
-        :rtype: list
+        :rtype: numpy.ndarray
 
         |
         """
 
-        orientation = 0
-        counter = 0
-        view_vel = [0]*param.DIM
-
-        for bird in group_birds:
-            if bird.index != self.index:
-                vect_dist = [bird.position[i] - self.position[i] for i in range(param.DIM)]
-                scalar_product = sum([self.direction[i]*vect_dist[i] for i in range(param.DIM)])
-                norm_self = math.sqrt(sum([self.direction[i]**2 for i in range(param.DIM)]))
-                norm_dist = math.sqrt(sum([vect_dist[i]**2 for i in range(param.DIM)]))
-                norm_prod = norm_self*norm_dist
-                div = scalar_product/norm_prod
-                if div <= -1:
-                    div = -1 + param.DELTA
-                elif div >= 1:
-                    div = 1 - param.DELTA
-                angle = math.acos(div)
-
-                if abs(angle) < param.VIEW_ANGLE and norm_dist < param.VIEW_DIST:
-
-                    if param.DIM == 2:
-                        orientation += (angle/abs(angle))*(param.VIEW_DIST-norm_dist)
-
-                    elif param.DIM == 3:
-                        vect_dist = [(vect_dist[i]*norm_self) / (norm_dist*math.cos(angle)) for i in range(param.DIM)]
-                        
-                        view_vel_bird = [self.direction[i] - vect_dist[i] for i in range(param.DIM)]
-                        norm_view_vel_bird = math.sqrt(sum([view_vel_bird[i]**2 for i in range(param.DIM)]))
+        others = [bird for bird in group_birds if bird.index != self.index]
+        direction = self._direction
 
-                        view_vel = [view_vel[i] + ((view_vel_bird[i]/norm_view_vel_bird) * (param.VIEW_DIST - norm_view_vel_bird)) for i in range(param.DIM)]
+        dist = _positions(others) - self._position
+        dist_sq = np.einsum('ij,ij->i', dist, dist)
 
-                    counter += 1
+        # Birds farther than the view distance can't be in the area of view
+        near = dist_sq < param.VIEW_DIST**2
+        dist, norm_dist = dist[near], np.sqrt(dist_sq[near])
 
-        if counter != 0:
+        norm_self = math.sqrt(np.dot(direction, direction))
+        div = (dist @ direction)/(norm_self*norm_dist)
+        div = np.where(div <= -1, -1 + param.DELTA, np.where(div >= 1, 1 - param.DELTA, div))
+        angle = np.arccos(div)
 
-            if param.DIM == 2:
-                orthogonal = [self.direction[1],-self.direction[0]]
-                view_vel = [orientation*(orthogonal[i]/counter) for i in range(param.DIM)]
-                return view_vel
-            
-            elif param.DIM == 3:
-                view_vel = [view_vel[i]/counter for i in range(param.DIM)]
-                return view_vel
+        seen = (np.abs(angle) < param.VIEW_ANGLE) & (norm_dist < param.VIEW_DIST)
+        counter = np.count_nonzero(seen)
+        if counter == 0:
+            return direction.copy()
 
-        else:
-            return copy.copy(self.direction)
+        if param.DIM == 2:
+            orientation = np.sum((angle[seen]/np.abs(angle[seen]))*(param.VIEW_DIST - norm_dist[seen]))
+            return orientation*np.array([direction[1], -direction[0]])/counter
+
+        elif param.DIM == 3:
+            vect_dist = dist[seen]*norm_self/(norm_dist[seen]*np.cos(angle[seen]))[:, None]
+            view_vel_bird = direction - vect_dist
+            norm_view_vel_bird = np.sqrt(np.einsum('ij,ij->i', view_vel_bird, view_vel_bird))
+            view_vel = (view_vel_bird/norm_view_vel_bird[:, None])*(param.VIEW_DIST - norm_view_vel_bird)[:, None]
+            return view_vel.sum(axis=0)/counter
             
                         
     def attraction(self, attraction_points):
         """
         Go towards attraction points.
+        If :py:data:`ATTRACTION_DIST` is set (see :py:mod:`parameters`), only the points closer than it are considered.
 
         :param attraction_points: list of coordinates of the attraction points (see :py:data:`ATTRACTION_POINTS` in :py:mod:`parameters`).
         :type attraction_points: list
         :return: velocity vector that responds to the attraction of the corresponding points.
-        :rtype: list
+        :rtype: numpy.ndarray
 
         |
         """
 
-        vel_attraction = [0]*param.DIM
-        counter = 0
+        vel_attraction = self._pointsCenter(attraction_points, param.ATTRACTION_DIST)
 
-        for point in attraction_points:
-            dist = [point.position[i] - self.position[i] for i in range(param.DIM)]
-
-            vel_attraction = [vel_attraction[i] + dist[i] for i in range(param.DIM)]
-            counter += 1
-
-        if counter != 0:
-            vel_attraction = [vel_attraction[i] / counter for i in range(param.DIM)]
+        if vel_attraction is not None:
             return vel_attraction
 
         else:
@@ -252,32 +361,68 @@ class Bird:
 
     def repulsion(self, repulsion_points):
         """
-        Go towards repulsion points.
+        Go away from repulsion points.
+        If :py:data:`REPULSION_DIST` is set (see :py:mod:`parameters`), only the points closer than it are considered.
 
         :param repulsion_points: list of coordinates of the repulsion points (see :py:data:`REPULSION_POINTS` in :py:mod:`parameters`).
         :type repulsion_points: list
         :return: velocity vector that responds to the repulsion of the corresponding points.
-        :rtype: list
+        :rtype: numpy.ndarray
 
         |
         """
 
-        vel_repulsion = [0]*param.DIM
-        counter = 0
-
-        for point in repulsion_points:
-            dist = [point.position[i] - self.position[i] for i in range(param.DIM)]
-
-            vel_repulsion = [vel_repulsion[i] + dist[i] for i in range(param.DIM)]
-            counter += 1
+        vel_repulsion = self._pointsCenter(repulsion_points, param.REPULSION_DIST)
 
-        if counter != 0:
-            vel_repulsion = [-vel_repulsion[i] / counter for i in range(param.DIM)]
-            return vel_repulsion
+        if vel_repulsion is not None:
+            return -vel_repulsion
         else:
             return copy.copy(self.direction)
 
 
+    def _pointsCenter(self, points, max_dist):
+        # Average vector from the bird to the points closer than max_dist (to all of them if it is 0), or None if there are none.
+        # The vectors to all points are computed at once, as an array.
+        if len(points) == 0:
+            return None
+
+        dist = _positions(points) - self._position
+        if max_dist:
+            dist_sq = np.einsum('ij,ij->i', dist, dist)
+            dist = dist[(dist_sq > 0) & (dist_sq < max_dist**2)]
+            if len(dist) == 0:
+                return None
+
+        return dist.mean(axis=0)
+
+
+    def _updateVelocity(self, rules):
+        # Combines the velocity vectors of the rules with the previous velocity, and moves the bird.
+        # The combination is computed with whole-array operations in the buffers of the bird; the rules themselves
+        # still build small arrays for every call, as the birds are the reference of the rules, not the engine (see flock).
+        rules_vel, new_vel = self._vel
+        rules_vel.fill(0)
+        for weight, vel in rules:
+            np.multiply(vel, weight, out=new_vel)
+            rules_vel += new_vel
+
+        np.multiply(self.previous_vel, 1-param.MU, out=new_vel)
+        rules_vel *= param.MU
+        new_vel += rules_vel
+
+        new_speed = math.sqrt(np.dot(new_vel, new_vel))
+        np.divide(new_vel, new_speed, out=self._direction)
+
+        if new_speed > param.MAX_VEL:
+            new_speed = param.MAX_VEL
+        elif new_speed < param.MIN_VEL:
+            new_speed = param.MIN_VEL
+
+        self.speed = new_speed
+
+        self.updatePos(param.TIME_DELTA)
+
+
     def update(self, close_neighbours, group_birds, attraction_points, repulsion_points):
         """
         Updates direction, speed and position of bird, considering all rules, and the attraction and repulsion points.
@@ -294,7 +439,7 @@ class Bird:
         |
         """
 
-        self.previous_vel = [self.speed * self.direction[i] for i in range(param.DIM)]
+        np.multiply(self.direction, self.speed, out=self.previous_vel)
 
         vel_avoidance = self.avoidance(close_neighbours)
         vel_center = self.center(group_birds)
@@ -303,75 +448,37 @@ class Bird:
         vel_attraction = self.attraction(attraction_points)
         vel_repulsion = self.repulsion(repulsion_points)
 
-        rules_vel = [param.W_AVOIDANCE*vel_avoidance[i] + param.W_CENTER*vel_center[i] + param.W_COPY*vel_copy[i] + param.W_VIEW*vel_view[i] \
-                    + param.W_ATTRACTION*vel_attraction[i] + param.W_REPULSION*vel_repulsion[i] for i in range(param.DIM)]
+        self._updateVelocity(((param.W_AVOIDANCE, vel_avoidance), (param.W_CENTER, vel_center), (param.W_COPY, vel_copy),
+                              (param.W_VIEW, vel_view), (param.W_ATTRACTION, vel_attraction), (param.W_REPULSION, vel_repulsion)))
 
-        new_vel = [self.previous_vel[i]*(1-param.MU) + rules_vel[i]*param.MU for i in range(param.DIM)]
 
-        if param.DIM == 2:
-            new_speed = math.sqrt(new_vel[0]**2 + new_vel[1]**2)
-        elif param.DIM == 3:
-            new_speed = math.sqrt(new_vel[0]**2 + new_vel[1]**2 + new_vel[2]**2)
-
-        self.direction = [new_vel[i]/new_speed for i in range(param.DIM)]
-
-        if new_speed > param.MAX_VEL:
-            new_speed = param.MAX_VEL
-        elif new_speed < param.MIN_VEL:
-            new_speed = param.MIN_VEL
-        
-        self.speed = new_speed
-
-        self.updatePos(param.TIME_DELTA)
-
-
-    def updateAttractor(self, all_birds):
+    def updateAttractor(self, all_birds, dist_sq=None):
         """
         Updates direction, speed and position of the attractor points. 
         They will avoid the birds that are closer than a minimum distance (see :py:data:`MIN_DIST_ATTRACTOR` in :py:mod:`parameters`).
 
         :param all_birds: all the birds in the simulation, represented as instances of the :class:`bird.Bird` class.
         :type all_birds: list
+        :param dist_sq: squared distances from the point to every bird, when they have already been computed (see :func:`updatePoints`), defaults to None.
+        :type dist_sq: numpy.ndarray, optional
 
         |
         """
 
-        self.previous_vel = [self.speed * self.direction[i] for i in range(param.DIM)]
+        np.multiply(self.direction, self.speed, out=self.previous_vel)
 
-        close_birds = []
+        if dist_sq is None:
+            dist_sq = distancesSquared([self], all_birds)[0]
 
-        for bird in all_birds:
-            if param.DIM == 2:
-                if math.sqrt((self.position[0]-bird.position[0])**2+(self.position[1]-bird.position[1])**2)<param.MIN_DIST_ATTRACTOR:
-                    close_birds.append(bird)
-            elif param.DIM == 3:
-                if math.sqrt((self.position[0]-bird.position[0])**2+(self.position[1]-bird.position[1])**2+(self.position[2]-bird.position[2])**2)<param.MIN_DIST_ATTRACTOR:
-                    close_birds.append(bird)
+        close_birds = [all_birds[k] for k in np.flatnonzero(dist_sq < param.MIN_DIST_ATTRACTOR**2)]
 
         vel_not_avoidance = self.avoidance(close_birds)
-        vel_avoidance = [-vel_not_avoidance[i] for i in range(param.DIM)]
-        
-        rules_vel = [param.W_AVOIDANCE*vel_avoidance[i] for i in range(param.DIM)]
-        new_vel = [self.previous_vel[i]*(1-param.MU) + rules_vel[i]*param.MU for i in range(param.DIM)]
 
-        if param.DIM == 2:
-            new_speed = math.sqrt(new_vel[0]**2 + new_vel[1]**2)
-        elif param.DIM == 3:
-            new_speed = math.sqrt(new_vel[0]**2 + new_vel[1]**2 + new_vel[2]**2)
-
-        self.direction = [new_vel[i]/new_speed for i in range(param.DIM)]
-
-        if new_speed > param.MAX_VEL:
-            new_speed = param.MAX_VEL
-        elif new_speed < param.MIN_VEL:
-            new_speed = param.MIN_VEL
-        
-        self.speed = new_speed
-
-        self.updatePos(param.TIME_DELTA)
+        # Attraction points move away from the birds, against the avoidance rule
+        self._updateVelocity(((-param.W_AVOIDANCE, vel_not_avoidance),))
 
     
-    def updateRepulsor(self, all_birds):
+    def updateRepulsor(self, all_birds, dist_sq=None):
         """
         Updates direction, speed and position of the repulsion points. 
         They will go towards the birds that are closer than a minimum distance (see :py:data:`MIN_DIST_REPULSOR` in :py:mod:`parameters`).
@@ -379,45 +486,21 @@ class Bird:
 
         :param all_birds: all the birds in the simulation, represented as instances of the :class:`bird.Bird` class.
         :type all_birds: list
+        :param dist_sq: squared distances from the point to every bird, when they have already been computed (see :func:`updatePoints`), defaults to None.
+        :type dist_sq: numpy.ndarray, optional
 
         |
         """
 
-        self.previous_vel = [self.speed * self.direction[i] for i in range(param.DIM)]
+        np.multiply(self.direction, self.speed, out=self.previous_vel)
 
-        close_birds = []
-        group_birds = []
+        if dist_sq is None:
+            dist_sq = distancesSquared([self], all_birds)[0]
 
-        for bird in all_birds:
-            if param.DIM == 2:
-                if math.sqrt((self.position[0]-bird.position[0])**2+(self.position[1]-bird.position[1])**2)<param.MIN_DIST_REPULSOR:
-                    close_birds.append(bird)
-                if math.sqrt((self.position[0]-bird.position[0])**2+(self.position[1]-bird.position[1])**2)<param.GROUP_DIST_REPULSOR:
-                    group_birds.append(bird)
-            elif param.DIM == 3:
-                if math.sqrt((self.position[0]-bird.position[0])**2+(self.position[1]-bird.position[1])**2+(self.position[2]-bird.position[2])**2)<param.MIN_DIST_ATTRACTOR:
-                    close_birds.append(bird)
-                if math.sqrt((self.position[0]-bird.position[0])**2+(self.position[1]-bird.position[1])**2+(self.position[2]-bird.position[2])**2)<param.GROUP_DIST_REPULSOR:
-                    group_birds.append(bird)
+        close_birds = [all_birds[k] for k in np.flatnonzero(dist_sq < param.MIN_DIST_REPULSOR**2)]
+        group_birds = [all_birds[k] for k in np.flatnonzero(dist_sq < param.GROUP_DIST_REPULSOR**2)]
 
         vel_not_avoidance = self.avoidance(close_birds)
         vel_center = self.center(group_birds)
-        
-        rules_vel = [param.W_AVOIDANCE*vel_not_avoidance[i] + param.W_CENTER*vel_center[i] for i in range(param.DIM)]
-        new_vel = [self.previous_vel[i]*(1-param.MU) + rules_vel[i]*param.MU for i in range(param.DIM)]
-
-        if param.DIM == 2:
-            new_speed = math.sqrt(new_vel[0]**2 + new_vel[1]**2)
-        elif param.DIM == 3:
-            new_speed = math.sqrt(new_vel[0]**2 + new_vel[1]**2 + new_vel[2]**2)
 
-        self.direction = [new_vel[i]/new_speed for i in range(param.DIM)]
-
-        if new_speed > param.MAX_VEL:
-            new_speed = param.MAX_VEL
-        elif new_speed < param.MIN_VEL:
-            new_speed = param.MIN_VEL
-        
-        self.speed = new_speed
-
-        self.updatePos(param.TIME_DELTA)
+        self._updateVelocity(((param.W_AVOIDANCE, vel_not_avoidance), (param.W_CENTER, vel_center)))
@@ -0,0 +1,144 @@
+"""
+.. module:: checkpoint
+
+Checkpoints of a simulation: its whole state is saved to a single binary file, from which the simulation can be resumed later.
+
+A checkpoint starts with a short header in JSON (step, parameters, state of the random generator and where every array is),
+followed by the arrays of the birds, attraction points and repulsion points, every one aligned to 64 bytes,
+so they are mapped to memory when the checkpoint is loaded instead of being read.
+"""
+
+import parameters as param
+import flock
+
+import json
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b'BIRDCKP1'
+PREFIX = struct.Struct('<8sQ')
+ALIGNMENT = 64
+KINDS = ('birds', 'attraction_points', 'repulsion_points')
+
+
+def align(offset: int):
+    """
+    Gives the first offset aligned to :py:data:`ALIGNMENT` bytes from a given one.
+
+    :param offset: offset, in bytes.
+    :type offset: int
+    :return: aligned offset, in bytes.
+    :rtype: int
+
+    |
+    """
+
+    return -(-offset//ALIGNMENT)*ALIGNMENT
+
+
+def save(path: str, birds, attraction_points, repulsion_points, config, step: int = 0, rng=None, **metadata):
+    """
+    Saves the state of a simulation to a file.
+    The file is replaced at once, so a run that is stopped while saving keeps the previous checkpoint.
+
+    :param path: path of the file.
+    :type path: str
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param step: number of steps run so far, defaults to 0.
+    :type step: int, optional
+    :param rng: random generator of the simulation, whose state is saved too, defaults to None.
+    :type rng: numpy.random.Generator, optional
+    :param metadata: other values that are saved in the header, which have to be serializable as JSON.
+    :type metadata: dict
+
+    |
+    """
+
+    arrays = []
+    for kind, points in zip(KINDS, (birds, attraction_points, repulsion_points)):
+        arrays += [(kind, 'position', points.position), (kind, 'direction', points.direction), (kind, 'speed', points.speed)]
+        if points.groups is not None:
+            arrays.append((kind, 'groups', points.groups))
+
+    header = {
+        'version': 1,
+        'step': step,
+        'config': config.values(),
+        'rng': rng.bit_generator.state if rng is not None else None,
+        'types': {kind: points.type for kind, points in zip(KINDS, (birds, attraction_points, repulsion_points))},
+        'metadata': metadata,
+        'arrays': [],
+    }
+
+    # Offsets of the arrays are measured from the end of the header
+    offset = 0
+    for kind, name, array in arrays:
+        header['arrays'].append({'kind': kind, 'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        offset = align(offset + array.nbytes)
+    text = json.dumps(header).encode()
+    start = align(PREFIX.size + len(text))
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(PREFIX.pack(MAGIC, len(text)))
+        file.write(text)
+        for (kind, name, array), entry in zip(arrays, header['arrays']):
+            file.seek(start + entry['offset'])
+            file.write(np.ascontiguousarray(array).tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def load(path: str):
+    """
+    Loads the state of a simulation from a file. Arrays are mapped to memory (copy on write), so only the parts that are used are read.
+
+    :param path: path of the file.
+    :type path: str
+    :return: the birds, the attraction points and the repulsion points (as instances of the class :class:`flock.Flock`), the parameters (as :class:`parameters.Config`), the number of steps run, the random generator (None if it was not saved) and the other values of the header.
+    :rtype: tuple
+    :raises ValueError: if the file is not a checkpoint.
+
+    |
+    """
+
+    with open(path, 'rb') as file:
+        magic, length = PREFIX.unpack(file.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a checkpoint'.format(path))
+        header = json.loads(file.read(length))
+    start = align(PREFIX.size + length)
+
+    arrays = {kind: {} for kind in KINDS}
+    for entry in header['arrays']:
+        shape = tuple(entry['shape'])
+        if np.prod(shape) == 0:
+            array = np.empty(shape, dtype=entry['dtype'])
+        else:
+            array = np.memmap(path, dtype=entry['dtype'], mode='c', offset=start + entry['offset'], shape=shape)
+        arrays[entry['kind']][entry['name']] = array
+
+    state = tuple(flock.Flock(arrays[kind]['position'], arrays[kind]['direction'], arrays[kind]['speed'],
+                              header['types'][kind], arrays[kind].get('groups'))
+                  for kind in KINDS)
+
+    config = param.Config(**{name: [tuple(point) for point in value] if name in ('ATTRACTION_POINTS', 'REPULSION_POINTS') else value
+                             for name, value in header['config'].items()})
+
+    rng = None
+    if header['rng'] is not None:
+        rng = np.random.Generator(getattr(np.random, header['rng']['bit_generator'])())
+        rng.bit_generator.state = header['rng']
+
+    return (*state, config, header['step'], rng, header['metadata'])
@@ -0,0 +1,368 @@
+"""
+.. module:: domain
+
+Domain decomposition of the simulation across processes, for flocks too large for one process.
+
+The container is split in slabs along the x coordinate, and every process owns the birds that are in its slab.
+In every step, processes send to their neighbours the birds that are closer than :py:data:`parameters.GROUP_DIST` to the border between them (the halo),
+so every bird sees all its neighbours, also the ones owned by other processes. Then every process moves its birds,
+and sends the ones that have left its slab (also through the boundaries of the container, see :meth:`flock.Flock.updatePos`) to their new owner.
+The attraction and repulsion points are updated by the main process, from the sums of the birds of every process (see :func:`flock.pointSums`).
+
+Only the synchronous update is supported (see :py:data:`parameters.SYNCHRONOUS`): when birds are updated one after another,
+every bird depends on the ones before it, also in other slabs. Processes are connected by pipes, so they run on a single computer, standing in for the nodes of a cluster.
+It can also be executed from the command line, for example::
+
+    python domain.py --processes 4 --steps 100 --set NUM_BIRDS=1000000
+"""
+
+import parameters as param
+import flock
+import initialize_birds
+import neighbours
+
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+
+def slabs(config, n_slabs: int):
+    """
+    Splits the container in slabs of the same width along the x coordinate.
+
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param n_slabs: number of slabs.
+    :type n_slabs: int
+    :return: limits of the slabs along x, with shape (n_slabs + 1,).
+    :rtype: numpy.ndarray
+    :raises ValueError: if the slabs are narrower than the distance at which birds see each other, as then halos would be needed from slabs that are not neighbours.
+
+    |
+    """
+
+    bounds = np.linspace(config.LOWER[0], config.UPPER[0], n_slabs + 1)
+    if n_slabs > 1 and bounds[1] - bounds[0] < haloWidth(config):
+        raise ValueError('slabs of {:.1f} pixels are narrower than the halo of {} pixels, use fewer processes'.format(bounds[1] - bounds[0], haloWidth(config)))
+    return bounds
+
+
+def haloWidth(config):
+    """
+    Gives the distance to the border of a slab from which birds are sent to the neighbour slab: the largest distance at which birds see each other.
+
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: the distance, in pixels.
+    :rtype: float
+
+    |
+    """
+
+    return max(config.GROUP_DIST, config.MIN_DIST)
+
+
+def owners(position, bounds):
+    """
+    Finds the slab where every bird is.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param bounds: limits of the slabs along x (see :func:`slabs`).
+    :type bounds: numpy.ndarray
+    :return: number of the slab of every bird, with shape (N,).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    return np.clip(np.searchsorted(bounds, position[:, 0], side='right') - 1, 0, len(bounds) - 2)
+
+
+def exchange(links, rank: int, messages: dict):
+    """
+    Sends a message to some processes and receives one from each of them.
+    Processes are visited in increasing order, and of every pair the one with the lower number sends first,
+    so no two processes wait for each other (if a process sends to another, the other has to send to it too).
+
+    :param links: connections to the other processes, by number of process.
+    :type links: dict
+    :param rank: number of this process.
+    :type rank: int
+    :param messages: messages to send, by number of process.
+    :type messages: dict
+    :return: messages received, by number of process.
+    :rtype: dict
+
+    |
+    """
+
+    received = {}
+    for peer in sorted(messages):
+        link = links[peer]
+        if rank < peer:
+            link.send(messages[peer])
+            received[peer] = link.recv()
+        else:
+            received[peer] = link.recv()
+            link.send(messages[peer])
+    return received
+
+
+def pack(ids, birds, mask):
+    # Birds are sent as their index in the whole flock and their arrays
+    return ids[mask], birds.position[mask], birds.direction[mask], birds.speed[mask]
+
+
+def unpack(parts, dim: int, type: int = 1):
+    ids = np.concatenate([part[0] for part in parts]) if parts else np.empty(0, dtype=np.intp)
+    birds = flock.Flock(np.concatenate([part[1] for part in parts]).reshape(-1, dim) if parts else np.empty((0, dim)),
+                        np.concatenate([part[2] for part in parts]).reshape(-1, dim) if parts else np.empty((0, dim)),
+                        np.concatenate([part[3] for part in parts]) if parts else np.empty(0), type)
+    return ids, birds
+
+
+def worker(rank: int, bounds, config, control, links, ids, position, direction, speed):
+    """
+    Runs the birds of a slab, in a process of its own, following the orders of the main process (see :class:`Domain`).
+
+    :param rank: number of the slab.
+    :type rank: int
+    :param bounds: limits of the slabs along x (see :func:`slabs`).
+    :type bounds: numpy.ndarray
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param control: connection to the main process.
+    :type control: multiprocessing.connection.Connection
+    :param links: connections to the other processes, by number of process.
+    :type links: dict
+    :param ids: index of every bird of the slab in the whole flock.
+    :type ids: numpy.ndarray
+    :param position: coordinates of the birds of the slab.
+    :type position: numpy.ndarray
+    :param direction: directions of the birds of the slab.
+    :type direction: numpy.ndarray
+    :param speed: speeds of the birds of the slab.
+    :type speed: numpy.ndarray
+
+    |
+    """
+
+    n_slabs = len(bounds) - 1
+    lower, upper = bounds[rank], bounds[rank+1]
+    halo = haloWidth(config)
+    birds = flock.Flock(position, direction, speed)
+
+    # Neighbour slabs, across the boundaries of the container only if birds see through them
+    left, right = rank - 1, rank + 1
+    if config.PERIODIC:
+        left, right = left % n_slabs, right % n_slabs
+    left = left if 0 <= left < n_slabs and left != rank else None
+    right = right if 0 <= right < n_slabs and right != rank else None
+
+    radii = (config.GROUP_DIST, config.MIN_DIST, min(config.VIEW_DIST, config.GROUP_DIST))
+
+    while True:
+        order, attraction_points, repulsion_points = control.recv()
+
+        if order == 'close':
+            break
+
+        if order == 'gather':
+            control.send((ids, birds.position, birds.direction, birds.speed))
+            continue
+
+        # Halos: birds close to the borders, sent to the neighbour slabs (both halos go to the same slab when there are only two)
+        masks = {}
+        if left is not None:
+            masks[left] = birds.position[:, 0] < lower + halo
+        if right is not None:
+            masks[right] = masks.get(right, False) | (birds.position[:, 0] >= upper - halo)
+        received = exchange(links, rank, {peer: pack(ids, birds, mask) for peer, mask in masks.items()})
+        halo_ids, halo_birds = unpack([received[peer] for peer in sorted(received)], config.DIM)
+
+        # Neighbours are searched among the birds of the slab and of the halo, which are only read
+        every_position = np.concatenate([birds.position, halo_birds.position])
+        every_direction = np.concatenate([birds.direction, halo_birds.direction])
+        grid = neighbours.SpatialGrid(every_position, config)
+        group_birds, close_neighbours, view_birds = grid.query(birds.position, radii, exclude_self=True,
+                                                               out=[birds.group_birds, birds.close_neighbours, birds.view_birds])
+        rules_vel = flock.rulesVelocity(birds.position, birds.direction, every_direction, group_birds, close_neighbours, view_birds,
+                                        attraction_points, repulsion_points, config)
+        birds.update(rules_vel, config)
+
+        # Migration: birds that have left the slab go to the process that owns their new position
+        owner = owners(birds.position, bounds)
+        messages = {peer: pack(ids, birds, owner == peer) for peer in range(n_slabs) if peer != rank}
+        received = exchange(links, rank, messages)
+        stay = owner == rank
+        ids, birds = unpack([pack(ids, birds, stay)] + [received[peer] for peer in sorted(received)], config.DIM)
+
+        # Partial sums of the attraction and repulsion points, added up by the main process
+        control.send(flock.pointSums(attraction_points, repulsion_points, birds, config))
+
+    control.close()
+
+
+class Domain:
+    """
+    The class that runs a simulation split in slabs, every one in a process of its own.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param processes: number of processes (and slabs), defaults to 2.
+    :type processes: int, optional
+    :raises ValueError: if the slabs would be too narrow (see :func:`slabs`), the birds hold several flocks, or the update is sequential.
+
+    |
+    """
+
+    def __init__(self, birds, attraction_points, repulsion_points, config, processes: int = 2):
+        """
+        Constructor for the domain class. Starts the processes.
+
+        |
+        """
+
+        if birds.groups is not None:
+            raise ValueError('several flocks cannot be split in slabs')
+        if not config.SYNCHRONOUS:
+            raise ValueError('the update of birds one after another (SYNCHRONOUS=False) cannot be split in slabs')
+
+        self.config = config
+        self.bounds = slabs(config, processes)
+        self.attraction_points = attraction_points
+        self.repulsion_points = repulsion_points
+        self.n_birds = len(birds)
+
+        links = [{} for rank in range(processes)]
+        for i in range(processes):
+            for j in range(i + 1, processes):
+                links[i][j], links[j][i] = multiprocessing.Pipe()
+
+        ids = np.arange(len(birds))
+        owner = owners(birds.position, self.bounds)
+        self.controls = []
+        self.processes = []
+        for rank in range(processes):
+            control, worker_control = multiprocessing.Pipe()
+            mine = owner == rank
+            process = multiprocessing.Process(target=worker, name='slab-{}'.format(rank), daemon=True,
+                                              args=(rank, self.bounds, config, worker_control, links[rank],
+                                                    ids[mine], birds.position[mine], birds.direction[mine], birds.speed[mine]))
+            process.start()
+            self.controls.append(control)
+            self.processes.append(process)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def step(self):
+        """
+        Advances the simulation one step: the processes update their birds, and then the attraction and repulsion points are updated.
+
+        |
+        """
+
+        # Points are only sent with their positions, which is all the rules of the birds use
+        attraction_points = flock.Flock(self.attraction_points.position, np.zeros_like(self.attraction_points.position),
+                                        np.zeros(len(self.attraction_points)), -1)
+        repulsion_points = flock.Flock(self.repulsion_points.position, np.zeros_like(self.repulsion_points.position),
+                                       np.zeros(len(self.repulsion_points)), -2)
+        for control in self.controls:
+            control.send(('step', attraction_points, repulsion_points))
+        partial = [control.recv() for control in self.controls]
+
+        # Sums of every process are added up (in the same order every time, so runs can be repeated)
+        if len(self.attraction_points):
+            sums = tuple(np.sum([part[0][k] for part in partial], axis=0) for k in range(2))
+            flock.updateAttractors(self.attraction_points, None, self.config, sums)
+        if len(self.repulsion_points):
+            sums = tuple(np.sum([part[1][k] for part in partial], axis=0) for k in range(4))
+            flock.updateRepulsors(self.repulsion_points, None, self.config, sums)
+
+
+    def gather(self):
+        """
+        Gathers the birds of all processes.
+
+        :return: the birds, the attraction points and the repulsion points, as instances of the class :class:`flock.Flock`.
+        :rtype: tuple
+
+        |
+        """
+
+        for control in self.controls:
+            control.send(('gather', None, None))
+        ids, birds = unpack([control.recv() for control in self.controls], self.config.DIM)
+
+        # Birds are given in their initial order
+        order = np.argsort(ids)
+        return flock.Flock(birds.position[order], birds.direction[order], birds.speed[order]), self.attraction_points, self.repulsion_points
+
+
+    def close(self):
+        """
+        Stops the processes.
+
+        |
+        """
+
+        for control in self.controls:
+            control.send(('close', None, None))
+        for process in self.processes:
+            process.join()
+        self.controls = []
+        self.processes = []
+
+
+def main():
+    """
+    Runs a simulation split in slabs from the command line, and prints how long it took.
+
+    |
+    """
+
+    import simulation
+
+    parser = argparse.ArgumentParser(description='Run the bird flock simulation split in slabs, on several processes.')
+    parser.add_argument('--processes', type=int, default=2, help='number of processes (and slabs)')
+    parser.add_argument('--steps', type=int, default=100, help='number of steps to run')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the initial state')
+    parser.add_argument('--set', type=simulation.parse_value, action='append', default=[], metavar='NAME=VALUE',
+                        help='value of a parameter of parameters.py (can be repeated)')
+    args = parser.parse_args()
+
+    try:
+        config = param.Config(**dict(args.set))
+        state = initialize_birds.generateState(config, args.seed)
+        domain = Domain(*state, config, args.processes)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    with domain:
+        for i in range(args.steps):
+            domain.step()
+    elapsed = time.perf_counter() - start
+
+    print('{} birds, {} processes, {} steps in {:.3f} s ({:.1f} steps/s)'.format(domain.n_birds, args.processes, args.steps, elapsed,
+                                                                               args.steps/elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+.. module:: ensemble
+
+Ensembles of independent flocks with the same number of birds, which are all advanced together by a single vectorized step.
+Birds of different flocks never see each other, and the attraction and repulsion points of a flock only act on its birds.
+"""
+
+import flock
+import simulation
+
+import numpy as np
+
+
+class Ensemble:
+    """
+    The class that represents K independent flocks of N birds each.
+    All of them are stored in a single :class:`flock.Flock` (and so are their attraction and repulsion points), flock after flock.
+
+    :param birds: the birds of all flocks, with :py:attr:`groups` set to the number of their flock.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of all flocks, with :py:attr:`groups` set.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of all flocks, with :py:attr:`groups` set.
+    :type repulsion_points: :class:`flock.Flock`
+    :param size: number of flocks (K).
+    :type size: int
+
+    |
+    """
+
+    def __init__(self, birds, attraction_points, repulsion_points, size: int):
+        """
+        Constructor for the ensemble class.
+
+        |
+        """
+
+        self.birds = birds
+        self.attraction_points = attraction_points
+        self.repulsion_points = repulsion_points
+        self.size = size
+
+
+    def __len__(self):
+        return self.size
+
+
+    @classmethod
+    def generate(cls, size: int, config, seed: int = None):
+        """
+        Generates the initial state of every flock, as :func:`simulation.initialize` does for a single one.
+
+        :param size: number of flocks (K).
+        :type size: int
+        :param config: parameters of the simulation.
+        :type config: :class:`parameters.Config`
+        :param seed: seed used to generate the initial positions and velocities, defaults to None (not reproducible).
+        :type seed: int, optional
+        :return: the ensemble.
+        :rtype: :class:`ensemble.Ensemble`
+
+        |
+        """
+
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+
+        # Flock k starts as a single simulation with the same seed and run number k
+        flocks = [simulation.initialize(config, seed, k) for k in range(size)]
+        return cls(*(join([flocks[k][kind] for k in range(size)]) for kind in range(3)), size)
+
+
+    def flock(self, k: int):
+        """
+        Gives a copy of one of the flocks.
+
+        :param k: number of the flock.
+        :type k: int
+        :return: the birds, the attraction points and the repulsion points of the flock, as instances of the class :class:`flock.Flock`.
+        :rtype: tuple
+
+        |
+        """
+
+        return tuple(flock.Flock(points.position[points.groups == k], points.direction[points.groups == k],
+                                 points.speed[points.groups == k], points.type)
+                     for points in (self.birds, self.attraction_points, self.repulsion_points))
+
+
+    @property
+    def position(self):
+        """
+        Coordinates of every bird of every flock, with shape (K, N, DIM).
+
+        |
+        """
+
+        return self.birds.position.reshape(self.size, -1, self.birds.position.shape[1])
+
+
+    @property
+    def direction(self):
+        """
+        Directions of every bird of every flock, with shape (K, N, DIM).
+
+        |
+        """
+
+        return self.birds.direction.reshape(self.size, -1, self.birds.direction.shape[1])
+
+
+    @property
+    def speed(self):
+        """
+        Speed of every bird of every flock, with shape (K, N).
+
+        |
+        """
+
+        return self.birds.speed.reshape(self.size, -1)
+
+
+    def step(self, config=None):
+        """
+        Advances all flocks one step (see :func:`flock.step`).
+
+        :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+        :type config: :class:`parameters.Config`, optional
+
+        |
+        """
+
+        flock.step(self.birds, self.attraction_points, self.repulsion_points, config)
+
+
+def join(flocks: list):
+    """
+    Puts several flocks together in a single one, keeping the number of the flock of every bird in :py:attr:`groups`.
+
+    :param flocks: instances of the class :class:`flock.Flock`, all with the same type.
+    :type flocks: list
+    :return: the joined flock.
+    :rtype: :class:`flock.Flock`
+
+    |
+    """
+
+    return flock.Flock(np.concatenate([points.position for points in flocks]),
+                       np.concatenate([points.direction for points in flocks]),
+                       np.concatenate([points.speed for points in flocks]),
+                       flocks[0].type,
+                       np.repeat(np.arange(len(flocks)), [len(points) for points in flocks]))
@@ -0,0 +1,1020 @@
+"""
+.. module:: flock
+
+Vectorized representation of a flock.
+The state of all birds is stored as arrays (one row per bird) and every rule of :class:`bird.Bird` is applied to all of them at once.
+"""
+
+import parameters as param
+import neighbours
+import profiling
+import kernels
+
+import numpy as np
+
+
+class Flock:
+    """
+    The class that represents a set of birds (or of attraction or repulsion points) as arrays.
+
+    :param position: coordinates of every bird, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param direction: direction of every bird's velocity vector, as unit vectors, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param speed: module of every bird's velocity vector, with shape (N,).
+    :type speed: numpy.ndarray
+    :param type: the type of objects that the instance represents. Value 1 for birds, -1 for attraction points, -2 for repulsion points.
+    :type type: int
+    :param groups: number of the flock of every bird, when the instance holds several independent flocks (see :py:mod:`ensemble`), with shape (N,). Defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+
+    |
+    """
+
+    def __init__(self, position, direction, speed, type: int = 1, groups=None):
+        """
+        Constructor for the flock class.
+
+        |
+        """
+
+        # Arrays of floats are not copied (for example, arrays mapped to a checkpoint file, see checkpoint.load)
+        self.position = np.asarray(position, dtype=float)
+        self.direction = np.asarray(direction, dtype=float)
+        self.speed = np.asarray(speed, dtype=float).reshape(-1)
+        self.type = type
+        self.groups = groups
+        self._grid = None
+        self._buffers = {}
+
+        # Neighbours found in the last step, whose buffers are reused in the next one
+        self.close_neighbours = neighbours.NeighbourList()
+        self.group_birds = neighbours.NeighbourList()
+        self.view_birds = neighbours.NeighbourList()
+
+        # Group mates at the current positions, and the grid they were found with (see groupMates)
+        self._mates = neighbours.NeighbourList()
+        self._mates_grid = None
+
+
+    def __len__(self):
+        return len(self.speed)
+
+
+    @classmethod
+    def fromBirds(cls, birds: list, type: int = 1, dim: int = None):
+        """
+        Builds a flock from a list of birds.
+
+        :param birds: instances of the :class:`bird.Bird` class.
+        :type birds: list
+        :param type: the type of objects in the list, used when it is empty, defaults to 1.
+        :type type: int, optional
+        :param dim: dimension of the simulation, used when the list is empty, defaults to :py:data:`DIM` (see :py:mod:`parameters`).
+        :type dim: int, optional
+        :return: flock with the state of the given birds.
+        :rtype: :class:`flock.Flock`
+
+        |
+        """
+
+        if len(birds) != 0:
+            type = birds[0].type
+            dim = len(birds[0].position)
+        elif dim is None:
+            dim = param.DIM
+
+        return cls(np.reshape([bird.position for bird in birds], (-1, dim)),
+                   np.reshape([bird.direction for bird in birds], (-1, dim)),
+                   [bird.speed for bird in birds],
+                   type)
+
+
+    def toBirds(self, first_index: int = 0):
+        """
+        Builds a list of birds that are views of the rows of the flock (see :meth:`bird.Bird.fromFlock`):
+        changes of the birds are changes of the flock, and the other way round.
+
+        :param first_index: index given to the first bird, defaults to 0.
+        :type first_index: int, optional
+        :return: list of instances of the class :class:`bird.Bird`.
+        :rtype: list
+
+        |
+        """
+
+        import bird
+
+        return [bird.Bird.fromFlock(self, i, first_index + i) for i in range(len(self))]
+
+
+    def _buffer(self, name: str, shape: tuple, dtype=float):
+        # Scratch arrays of the updates, allocated once and reused in every step
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+
+    def updatePos(self, diff_time, config):
+        """
+        Update the positions of all birds using their speed and direction.
+        Takes into consideration boundary conditions, in the same way as :meth:`bird.Bird.updatePos`.
+        Positions are changed in place, without allocating arrays.
+
+        :param diff_time: small interval of time used to update position based on velocity.
+        :type diff_time: float
+        :param config: parameters of the simulation.
+        :type config: :class:`parameters.Config`
+
+        |
+        """
+
+        shape = self.position.shape
+        distance = self._buffer('distance', shape[:1])
+        move = self._buffer('move', shape)
+        np.multiply(self.speed, diff_time, out=distance)
+        np.multiply(distance[:, None], self.direction, out=move)
+        # Arrays are changed in place, as birds can be views of them (see toBirds)
+        self.position += move
+
+        # Apply boundary conditions (both sides are found before any bird is moved)
+        below = self._buffer('below', shape, bool)
+        above = self._buffer('above', shape, bool)
+        np.less(self.position, config.LOWER, out=below)
+        np.greater(self.position, config.UPPER, out=above)
+        np.copyto(self.position, config.UPPER, where=below)
+        np.copyto(self.position, config.LOWER, where=above)
+        self._grid = None
+
+
+    def grid(self, config):
+        """
+        Gives the grid of cells where the birds are, which is only rebuilt after they have moved.
+
+        :param config: parameters of the simulation.
+        :type config: :class:`parameters.Config`
+        :return: grid with the current positions of the birds.
+        :rtype: :class:`neighbours.SpatialGrid`
+
+        |
+        """
+
+        if self._grid is None or self._grid.config is not config:
+            self._grid = neighbours.SpatialGrid(self.position, config, groups=self.groups)
+        return self._grid
+
+
+    def groupMates(self, config):
+        """
+        Gives, for every bird, the group mates that are closer than :py:data:`GROUP_DIST` (see :py:mod:`parameters`) at the current positions.
+        The lists of the step (see :func:`updateBirds`) were found before the birds moved, so they are searched again with the grid of the birds
+        (see :meth:`grid`), which is kept for the next step. The result is kept until the birds move, so it is only searched once.
+
+        :param config: parameters of the simulation.
+        :type config: :class:`parameters.Config`
+        :return: for every bird, its group mates.
+        :rtype: :class:`neighbours.NeighbourList`
+
+        |
+        """
+
+        grid = self.grid(config)
+        if self._mates_grid is not grid:
+            grid.query(self.position, (config.GROUP_DIST,), exclude_self=True, groups=self.groups, out=[self._mates])
+            self._mates_grid = grid
+        return self._mates
+
+
+    def update(self, rules_vel, config):
+        """
+        Updates direction, speed and position of all birds from the velocity vector given by the rules, in the same way as :meth:`bird.Bird.update`.
+        Arrays are changed in place, and the intermediate results are kept in buffers that are reused in every step.
+
+        :param rules_vel: weighted sum of the velocity vectors of all rules, with shape (N, DIM).
+        :type rules_vel: numpy.ndarray
+        :param config: parameters of the simulation.
+        :type config: :class:`parameters.Config`
+
+        |
+        """
+
+        new_vel = self._buffer('new_vel', self.position.shape)
+        weighted_vel = self._buffer('weighted_vel', self.position.shape)
+        new_speed = self._buffer('new_speed', self.speed.shape)
+
+        # new_vel = previous_vel*(1-MU) + rules_vel*MU, computed in place
+        np.multiply(self.speed[:, None], self.direction, out=new_vel)
+        new_vel *= 1 - config.MU
+        np.multiply(rules_vel, config.MU, out=weighted_vel)
+        new_vel += weighted_vel
+
+        np.einsum('ij,ij->i', new_vel, new_vel, out=new_speed)
+        np.sqrt(new_speed, out=new_speed)
+
+        np.divide(new_vel, new_speed[:, None], out=self.direction)
+        np.clip(new_speed, config.MIN_VEL, config.MAX_VEL, out=self.speed)
+
+        self.updatePos(config.TIME_DELTA, config)
+
+
+def norm(vectors):
+    """
+    Computes the module of every row of an array.
+
+    :param vectors: array with shape (N, DIM).
+    :type vectors: numpy.ndarray
+    :return: modules, with shape (N,).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    return np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+
+
+def sumByRow(i, values, n):
+    """
+    Adds up the values of all pairs that belong to the same bird.
+
+    :param i: index of the bird each value belongs to, with shape (M,).
+    :type i: numpy.ndarray
+    :param values: values to add, with shape (M,) or (M, DIM).
+    :type values: numpy.ndarray
+    :param n: number of birds.
+    :type n: int
+    :return: sums, with shape (n,) or (n, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    if values.ndim == 1:
+        return np.bincount(i, weights=values, minlength=n)
+    return np.stack([np.bincount(i, weights=values[:, k], minlength=n) for k in range(values.shape[1])], axis=1)
+
+
+def avoidanceSums(close_neighbours, n: int, config):
+    """
+    Adds up, for every bird, the vectors that separate it from the neighbours that are too close, and counts them.
+    Sums of several sets of neighbours (for example, found by several processes, see :py:mod:`domain`) can be added before the rule is applied.
+
+    :param close_neighbours: for every bird, the neighbours that are closer than the minimum distance (see :meth:`neighbours.SpatialGrid.query`).
+    :type close_neighbours: :class:`neighbours.NeighbourList`
+    :param n: number of birds.
+    :type n: int
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: sums of the vectors, with shape (N, DIM), and numbers of neighbours, with shape (N,).
+    :rtype: tuple
+
+    |
+    """
+
+    mod_dist = np.sqrt(close_neighbours.dist_sq)
+    total = sumByRow(close_neighbours.rows, ((config.MIN_DIST - mod_dist)/mod_dist)[:, None]*close_neighbours.displacement, n)
+    return total, close_neighbours.counts()
+
+
+def avoidanceFromSums(direction, total, counter):
+    """
+    Applies the Avoidance rule from the sums given by :func:`avoidanceSums`.
+
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param total: sums of the vectors, with shape (N, DIM).
+    :type total: numpy.ndarray
+    :param counter: numbers of neighbours, with shape (N,).
+    :type counter: numpy.ndarray
+    :return: velocity vectors that respond to the Avoidance rule, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    vel = direction.copy()
+    found = counter != 0
+    vel[found] = -total[found]/counter[found, None]
+    return vel
+
+
+def avoidance(direction, close_neighbours, config):
+    """
+    Separate every bird from neighbours that are too close, as in :meth:`bird.Bird.avoidance`.
+
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param close_neighbours: for every bird, the neighbours that are closer than the minimum distance (see :meth:`neighbours.SpatialGrid.query`).
+    :type close_neighbours: :class:`neighbours.NeighbourList`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: velocity vectors that respond to the Avoidance rule, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    return avoidanceFromSums(direction, *avoidanceSums(close_neighbours, len(direction), config))
+
+
+def centerSums(group_birds, n: int):
+    """
+    Adds up, for every bird, the vectors that go to its group mates, and counts them.
+    Sums of several sets of neighbours can be added before the rule is applied (see :func:`avoidanceSums`).
+
+    :param group_birds: for every bird, the group mates that are closer than the group boundary distance (see :meth:`neighbours.SpatialGrid.query`).
+    :type group_birds: :class:`neighbours.NeighbourList`
+    :param n: number of birds.
+    :type n: int
+    :return: sums of the vectors, with shape (N, DIM), and numbers of group mates, with shape (N,).
+    :rtype: tuple
+
+    |
+    """
+
+    return sumByRow(group_birds.rows, group_birds.displacement, n), group_birds.counts()
+
+
+def centerFromSums(position, direction, total, counter):
+    """
+    Applies the Center rule from the sums given by :func:`centerSums`.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param total: sums of the vectors, with shape (N, DIM).
+    :type total: numpy.ndarray
+    :param counter: numbers of group mates, with shape (N,).
+    :type counter: numpy.ndarray
+    :return: velocity vectors that respond to the Center rule, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    vel = direction.copy()
+
+    # As in bird.Bird.center, every coordinate of the center is measured from the bird's first coordinate
+    found = counter != 0
+    vel[found] = total[found]/counter[found, None] + position[found] - position[found, :1]
+    return vel
+
+
+def center(position, direction, group_birds, config):
+    """
+    Seek cohesion with other bird's positions, as in :meth:`bird.Bird.center`.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param group_birds: for every bird, the group mates that are closer than the group boundary distance (see :meth:`neighbours.SpatialGrid.query`).
+    :type group_birds: :class:`neighbours.NeighbourList`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: velocity vectors that respond to the Center rule, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    return centerFromSums(position, direction, *centerSums(group_birds, len(position)))
+
+
+def copy(direction, neighbour_direction, group_birds, config):
+    """
+    Seek cohesion with other bird's directions, as in :meth:`bird.Bird.copy`.
+
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param neighbour_direction: directions of the group mates, with shape (M, DIM).
+    :type neighbour_direction: numpy.ndarray
+    :param group_birds: for every bird, the group mates that are closer than the group boundary distance (see :meth:`neighbours.SpatialGrid.query`).
+    :type group_birds: :class:`neighbours.NeighbourList`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: velocity vectors that respond to the Copy rule, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    n = len(direction)
+    vel = direction.copy()
+    i, j = group_birds.rows, group_birds.indices
+
+    total = sumByRow(i, neighbour_direction[j], n)
+    counter = group_birds.counts()
+
+    found = counter != 0
+    vel[found] = total[found]/counter[found, None]
+    return vel
+
+
+def view(direction, view_birds, config, profiler=profiling.NULL):
+    """
+    Move if there is another bird in area of view, as in :meth:`bird.Bird.view`.
+
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param view_birds: for every bird, the group mates that are closer than the view distance (see :py:data:`VIEW_DIST` in :py:mod:`parameters`).
+    :type view_birds: :class:`neighbours.NeighbourList`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param profiler: profiler that counts the neighbours in the area of view (``view_hits``), defaults to :py:data:`profiling.NULL`.
+    :type profiler: :class:`profiling.Profiler`, optional
+    :return: velocity vectors that respond to the View rule, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    n = len(direction)
+    vel = direction.copy()
+    i = view_birds.rows
+
+    vect_dist = view_birds.displacement
+    own_direction = direction[i]
+    norm_self = norm(direction)[i]
+    norm_dist = np.sqrt(view_birds.dist_sq)
+
+    # Cosine of the angle between the bird's direction and the neighbour (the angle is never compared directly)
+    div = np.einsum('ij,ij->i', own_direction, vect_dist)/(norm_self*norm_dist)
+    div = np.where(div <= -1, -1 + config.DELTA, np.where(div >= 1, 1 - config.DELTA, div))
+
+    seen = div > config.COS_VIEW_ANGLE
+    i, div, norm_dist = i[seen], div[seen], norm_dist[seen]
+    profiler.count('view_hits', len(i))
+    counter = np.bincount(i, minlength=n)
+    found = counter != 0
+
+    if config.DIM == 2:
+        # The angle given by acos is always positive, so every neighbour turns the bird to the same side
+        orientation = sumByRow(i, config.VIEW_DIST - norm_dist, n)
+        orthogonal = np.stack([direction[:, 1], -direction[:, 0]], axis=1)
+        vel[found] = orientation[found, None]*orthogonal[found]/counter[found, None]
+
+    elif config.DIM == 3:
+        vect_dist = vect_dist[seen]*(norm_self[seen]/(norm_dist*div))[:, None]
+        view_vel_bird = own_direction[seen] - vect_dist
+        norm_view_vel_bird = norm(view_vel_bird)
+        total = sumByRow(i, view_vel_bird*((config.VIEW_DIST - norm_view_vel_bird)/norm_view_vel_bird)[:, None], n)
+        vel[found] = total[found]/counter[found, None]
+
+    return vel
+
+
+def rules():
+    """
+    Gives the rules that are applied to the birds: the compiled ones (see :py:mod:`kernels`) if numba is installed, or the ones of this module otherwise.
+
+    :return: the functions of the rules avoidance, center, copy and view.
+    :rtype: tuple
+
+    |
+    """
+
+    if kernels.ENABLED:
+        return kernels.avoidance, kernels.center, kernels.copy, kernels.view
+    return avoidance, center, copy, view
+
+
+def pointsCenter(n, points_position, groups=None, points_groups=None):
+    """
+    Computes, for every bird, the average position of the points of its flock.
+
+    :param n: number of birds.
+    :type n: int
+    :param points_position: coordinates of the points, with shape (P, DIM).
+    :type points_position: numpy.ndarray
+    :param groups: number of the flock of every bird, defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+    :param points_groups: number of the flock of every point, defaults to None (one flock).
+    :type points_groups: numpy.ndarray, optional
+    :return: the average positions, with shape (n, DIM), and whether the flock of every bird has any point, with shape (n,).
+    :rtype: tuple
+
+    |
+    """
+
+    dim = points_position.shape[1]
+
+    if groups is None:
+        if len(points_position) == 0:
+            return np.zeros((n, dim)), np.zeros(n, dtype=bool)
+        return np.broadcast_to(points_position.mean(axis=0), (n, dim)), np.ones(n, dtype=bool)
+
+    n_groups = int(groups.max()) + 1 if n != 0 else 0
+    counter = np.bincount(points_groups, minlength=n_groups)
+    total = sumByRow(points_groups, points_position, n_groups)
+    with np.errstate(invalid='ignore'):
+        center = total/counter[:, None]
+    return center[groups], counter[groups] != 0
+
+
+def pointsCenterWithin(position, points_position, radius, config, groups=None, points_groups=None):
+    """
+    Computes, for every bird, the average position of the points of its flock that are closer than a distance.
+    The points are placed in a grid (see :class:`neighbours.SpatialGrid`), so every bird only checks the cells around it, however many points there are.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param points_position: coordinates of the points, with shape (P, DIM).
+    :type points_position: numpy.ndarray
+    :param radius: the distance, in pixels.
+    :type radius: float
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param groups: number of the flock of every bird, defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+    :param points_groups: number of the flock of every point, defaults to None (one flock).
+    :type points_groups: numpy.ndarray, optional
+    :return: the average positions, with shape (N, DIM), and whether every bird has any point close enough, with shape (N,).
+    :rtype: tuple
+
+    |
+    """
+
+    n, dim = position.shape
+    if len(points_position) == 0:
+        return np.zeros((n, dim)), np.zeros(n, dtype=bool)
+
+    # Cells are not smaller than needed to hold about one point each, so a short distance does not make the grid huge
+    cell_size = max(radius, float(config.LENGTH.max())/len(points_position)**(1/dim))
+    # Every flock has its own cells, so a bird only checks the points of its flock
+    n_groups = None if groups is None else int(max(groups.max(initial=0), points_groups.max(initial=0))) + 1
+    grid = neighbours.SpatialGrid(points_position, config, cell_size, groups=points_groups, n_groups=n_groups)
+    close_points, = grid.query(position, (radius,), groups=groups)
+
+    rows, dist = close_points.rows, close_points.displacement
+
+    counter = np.bincount(rows, minlength=n)
+    found = counter != 0
+    center = np.zeros((n, dim))
+    # Measured from every bird, so the vectors through the boundaries are used if PERIODIC is set
+    center[found] = position[found] + sumByRow(rows, dist, n)[found]/counter[found, None]
+    return center, found
+
+
+def attraction(position, direction, points_position, config, groups=None, points_groups=None):
+    """
+    Go towards attraction points, as in :meth:`bird.Bird.attraction`.
+    If :py:data:`ATTRACTION_DIST` is set (see :py:mod:`parameters`), only the points closer than it are considered.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param points_position: coordinates of the attraction points, with shape (P, DIM).
+    :type points_position: numpy.ndarray
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param groups: number of the flock of every bird, when there are several independent flocks, defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+    :param points_groups: number of the flock of every point, defaults to None (one flock).
+    :type points_groups: numpy.ndarray, optional
+    :return: velocity vectors that respond to the attraction of the points, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    vel = direction.copy()
+    if config.ATTRACTION_DIST:
+        center, found = pointsCenterWithin(position, points_position, config.ATTRACTION_DIST, config, groups, points_groups)
+    else:
+        center, found = pointsCenter(len(position), points_position, groups, points_groups)
+    vel[found] = center[found] - position[found]
+    return vel
+
+
+def repulsion(position, direction, points_position, config, groups=None, points_groups=None):
+    """
+    Go away from repulsion points, as in :meth:`bird.Bird.repulsion`.
+    If :py:data:`REPULSION_DIST` is set (see :py:mod:`parameters`), only the points closer than it are considered.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param points_position: coordinates of the repulsion points, with shape (P, DIM).
+    :type points_position: numpy.ndarray
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param groups: number of the flock of every bird, when there are several independent flocks, defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+    :param points_groups: number of the flock of every point, defaults to None (one flock).
+    :type points_groups: numpy.ndarray, optional
+    :return: velocity vectors that respond to the repulsion of the points, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    vel = direction.copy()
+    if config.REPULSION_DIST:
+        center, found = pointsCenterWithin(position, points_position, config.REPULSION_DIST, config, groups, points_groups)
+    else:
+        center, found = pointsCenter(len(position), points_position, groups, points_groups)
+    vel[found] = position[found] - center[found]
+    return vel
+
+
+def rulesVelocity(position, direction, neighbour_direction, group_birds, close_neighbours, view_birds,
+                  attraction_points, repulsion_points, config, groups=None, profiler=profiling.NULL):
+    """
+    Computes the weighted sum of the velocity vectors of all rules, for some birds whose neighbours have been found.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param direction: directions of the birds, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :param neighbour_direction: directions of all birds of the flock, which the indices of the neighbours refer to, with shape (M, DIM).
+    :type neighbour_direction: numpy.ndarray
+    :param group_birds: for every bird, the birds that are closer than the group boundary distance.
+    :type group_birds: :class:`neighbours.NeighbourList`
+    :param close_neighbours: for every bird, the birds that are closer than the minimum distance.
+    :type close_neighbours: :class:`neighbours.NeighbourList`
+    :param view_birds: for every bird, the group mates that are closer than the view distance.
+    :type view_birds: :class:`neighbours.NeighbourList`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param groups: number of the flock of every bird, when there are several independent flocks, defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+    :param profiler: profiler where the birds seen by the view rule are counted, defaults to :py:data:`profiling.NULL`.
+    :type profiler: :class:`profiling.Profiler`, optional
+    :return: velocity vectors given by the rules, with shape (N, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    rule_avoidance, rule_center, rule_copy, rule_view = rules()
+
+    return config.W_AVOIDANCE*rule_avoidance(direction, close_neighbours, config) \
+         + config.W_CENTER*rule_center(position, direction, group_birds, config) \
+         + config.W_COPY*rule_copy(direction, neighbour_direction, group_birds, config) \
+         + config.W_VIEW*rule_view(direction, view_birds, config, profiler) \
+         + config.W_ATTRACTION*attraction(position, direction, attraction_points.position, config, groups, attraction_points.groups) \
+         + config.W_REPULSION*repulsion(position, direction, repulsion_points.position, config, groups, repulsion_points.groups)
+
+
+def updateBirds(birds, attraction_points, repulsion_points, config, profiler=profiling.NULL):
+    """
+    Updates direction, speed and position of all birds, considering all rules, and the attraction and repulsion points.
+    The update is synchronous (see :py:data:`SYNCHRONOUS` in :py:mod:`parameters`): the rules of all birds read the state before the step,
+    and their results are kept apart until every bird has been considered, so the order of the birds does not matter.
+    Then all birds are moved at once, writing the new state over the old one, so birds that are views of the flock stay valid (see :meth:`Flock.toBirds`).
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param profiler: profiler of the phases ``neighbours``, ``rules`` and ``move``, defaults to :py:data:`profiling.NULL`.
+    :type profiler: :class:`profiling.Profiler`, optional
+
+    |
+    """
+
+    position, direction = birds.position, birds.direction
+
+    with profiler.phase('neighbours'):
+        # Only group mates can be in the area of view
+        radii = (config.GROUP_DIST, config.MIN_DIST, min(config.VIEW_DIST, config.GROUP_DIST))
+        group_birds, close_neighbours, view_birds = birds.grid(config).query(position, radii, exclude_self=True, groups=birds.groups,
+                                                                             out=[birds.group_birds, birds.close_neighbours, birds.view_birds])
+
+    if profiler.counters:
+        profiler.count('group_birds', group_birds.size)
+        profiler.count('close_birds', close_neighbours.size)
+        profiler.count('view_birds', view_birds.size)
+
+    with profiler.phase('rules'):
+        rules_vel = rulesVelocity(position, direction, direction, group_birds, close_neighbours, view_birds,
+                                  attraction_points, repulsion_points, config, birds.groups, profiler)
+
+    with profiler.phase('move'):
+        birds.update(rules_vel, config)
+
+
+def updateBirdsSequential(birds, attraction_points, repulsion_points, config, profiler=profiling.NULL):
+    """
+    Updates the birds one after another, in the order of their indices, as the first versions of the simulation did.
+    Neighbours are found once, before any bird is moved, but every bird sees the current position and direction of its neighbours,
+    so the ones before it have already been moved in this step. Results depend on the order of the birds,
+    so this is only used to compare with the synchronous update (see :func:`updateBirds`).
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param profiler: profiler of the phases ``neighbours`` and ``rules`` (which includes moving every bird), defaults to :py:data:`profiling.NULL`.
+    :type profiler: :class:`profiling.Profiler`, optional
+
+    |
+    """
+
+    position, direction, speed = birds.position, birds.direction, birds.speed
+
+    with profiler.phase('neighbours'):
+        group_birds, close_neighbours = birds.grid(config).query(position, (config.GROUP_DIST, config.MIN_DIST), exclude_self=True, groups=birds.groups,
+                                                                 out=[birds.group_birds, birds.close_neighbours])
+
+    if profiler.counters:
+        profiler.count('group_birds', group_birds.size)
+        profiler.count('close_birds', close_neighbours.size)
+
+    view_dist_sq = min(config.VIEW_DIST, config.GROUP_DIST)**2
+
+    # Neighbours of one bird, with the distances to where they are now
+    group_row, close_row, view_row = neighbours.NeighbourList(), neighbours.NeighbourList(), neighbours.NeighbourList()
+
+    with profiler.phase('rules'):
+        for k in range(len(birds)):
+            for neighbour_list, row_list in ((group_birds, group_row), (close_neighbours, close_row)):
+                j = neighbour_list[k]
+                dist, dist_sq = neighbours.pairDistances(position[k], position[j], config)
+                row_list.reset(1)
+                row_list.extend(np.zeros(len(j), dtype=np.intp), j, dist, dist_sq)
+                row_list.finish()
+            in_view = group_row.dist_sq < view_dist_sq
+            view_row.reset(1)
+            view_row.extend(group_row.rows[in_view], group_row.indices[in_view], group_row.displacement[in_view], group_row.dist_sq[in_view])
+            view_row.finish()
+
+            row = slice(k, k+1)
+            groups = birds.groups[row] if birds.groups is not None else None
+            rules_vel = rulesVelocity(position[row], direction[row], direction, group_row, close_row, view_row,
+                                      attraction_points, repulsion_points, config, groups, profiler)
+
+            # The bird is moved before the next one is considered
+            Flock(position[row], direction[row], speed[row], birds.type).update(rules_vel, config)
+
+    birds._grid = None
+
+
+def pointsSums(points_position, birds, min_dist, group_dist, config, groups=None, chunk: int = None):
+    """
+    Finds, for some points, the birds that are closer than a minimum distance and the ones that are closer than a group distance,
+    and adds up their vectors (see :func:`avoidanceSums` and :func:`centerSums`).
+    The distances from a block of points to every bird are computed at once, as a matrix, so no list of pairs is built:
+    the group distance of the repulsion points covers most of the container, where a search with the grid would not discard any bird.
+
+    :param points_position: coordinates of the points, with shape (P, DIM).
+    :type points_position: numpy.ndarray
+    :param birds: the birds of the simulation (or some of them).
+    :type birds: :class:`flock.Flock`
+    :param min_dist: minimum distance of every point, with shape (P,).
+    :type min_dist: numpy.ndarray
+    :param group_dist: group distance of every point (0 if the Center rule is not used), with shape (P,).
+    :type group_dist: numpy.ndarray
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param groups: number of the flock of every point, whose birds are the only ones considered, defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+    :param chunk: number of points considered at once, defaults to as many as keep the matrix around a million distances.
+    :type chunk: int, optional
+    :return: sums of the vectors and numbers of birds of the Avoidance rule, and then of the Center rule, for every point.
+    :rtype: tuple
+
+    |
+    """
+
+    n_points, dim = points_position.shape
+    min_dist_sq = np.square(np.asarray(min_dist, dtype=float))
+    group_dist_sq = np.square(np.asarray(group_dist, dtype=float))
+    if chunk is None:
+        chunk = max(1, 2**20//max(1, len(birds)))
+
+    avoidance_total, center_total = np.zeros((n_points, dim)), np.zeros((n_points, dim))
+    avoidance_counter, center_counter = np.zeros(n_points, dtype=np.intp), np.zeros(n_points, dtype=np.intp)
+
+    # Coordinates go first, so every coordinate of the matrix is contiguous
+    birds_position = np.ascontiguousarray(birds.position.T)[:, None, :]
+    length = config.LENGTH[:, None, None]
+
+    for first in range(0, n_points, chunk):
+        block = slice(first, first + chunk)
+
+        dist = birds_position - points_position[block].T[:, :, None]
+        if config.PERIODIC:
+            dist -= length*np.round(dist/length)
+        dist_sq = np.einsum('kij,kij->ij', dist, dist)
+        # As in the search with the grid, birds at the exact position of the point are skipped
+        valid = dist_sq > 0
+        if groups is not None:
+            valid &= groups[block, None] == birds.groups[None, :]
+
+        # Few birds are closer than the minimum distance, so only those pairs are taken out of the matrix
+        point, bird = np.nonzero(valid & (dist_sq < min_dist_sq[block, None]))
+        mod_dist = np.sqrt(dist_sq[point, bird])
+        n_block = len(dist_sq)
+        avoidance_total[block] = sumByRow(point, ((config.MIN_DIST - mod_dist)/mod_dist)[:, None]*dist[:, point, bird].T, n_block)
+        avoidance_counter[block] = np.bincount(point, minlength=n_block)
+
+        if group_dist_sq[block].any():
+            mates = valid & (dist_sq < group_dist_sq[block, None])
+            center_total[block] = np.einsum('ij,kij->ik', mates.astype(float), dist)
+            center_counter[block] = np.count_nonzero(mates, axis=1)
+
+    return avoidance_total, avoidance_counter, center_total, center_counter
+
+
+def pointSums(attraction_points, repulsion_points, birds, config):
+    """
+    Computes the sums of the attraction points (see :func:`attractorSums`) and of the repulsion points (see :func:`repulsorSums`) together,
+    with a single matrix of distances for all of them.
+
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param birds: the birds of the simulation (or some of them).
+    :type birds: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: sums of the attraction points and sums of the repulsion points.
+    :rtype: tuple
+
+    |
+    """
+
+    n_attraction, n_repulsion = len(attraction_points), len(repulsion_points)
+    position = np.concatenate([attraction_points.position, repulsion_points.position])
+    min_dist = np.concatenate([np.full(n_attraction, float(config.MIN_DIST_ATTRACTOR)), np.full(n_repulsion, float(config.MIN_DIST_REPULSOR))])
+    group_dist = np.concatenate([np.zeros(n_attraction), np.full(n_repulsion, float(config.GROUP_DIST_REPULSOR))])
+    groups = None
+    if attraction_points.groups is not None or repulsion_points.groups is not None:
+        # Points without groups belong to the first flock
+        groups = np.concatenate([points.groups if points.groups is not None else np.zeros(len(points), dtype=int)
+                                 for points in (attraction_points, repulsion_points)])
+
+    sums = pointsSums(position, birds, min_dist, group_dist, config, groups)
+    return tuple(total[:n_attraction] for total in sums[:2]), tuple(total[n_attraction:] for total in sums)
+
+
+def attractorSums(attraction_points, birds, config):
+    """
+    Finds the birds that every attraction point avoids, and adds up their vectors (see :func:`pointsSums`).
+
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param birds: the birds of the simulation (or some of them).
+    :type birds: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: sums of the vectors and numbers of birds, for every attraction point.
+    :rtype: tuple
+
+    |
+    """
+
+    n = len(attraction_points)
+    return pointsSums(attraction_points.position, birds, np.full(n, float(config.MIN_DIST_ATTRACTOR)), np.zeros(n), config,
+                      attraction_points.groups)[:2]
+
+
+def updateAttractors(attraction_points, birds, config, sums=None):
+    """
+    Updates direction, speed and position of the attraction points, as in :meth:`bird.Bird.updateAttractor`.
+
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param sums: sums given by :func:`attractorSums`, when they have already been computed (then the birds are not used), defaults to None.
+    :type sums: tuple, optional
+
+    |
+    """
+
+    if len(attraction_points) == 0:
+        return
+
+    if sums is None:
+        sums = attractorSums(attraction_points, birds, config)
+
+    vel_avoidance = -avoidanceFromSums(attraction_points.direction, *sums)
+
+    attraction_points.update(config.W_AVOIDANCE*vel_avoidance, config)
+
+
+def repulsorSums(repulsion_points, birds, config):
+    """
+    Finds the birds that every repulsion point goes towards, and adds up their vectors (see :func:`pointsSums`).
+
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param birds: the birds of the simulation (or some of them).
+    :type birds: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: sums of the vectors and numbers of birds of the Avoidance rule, and then of the Center rule, for every repulsion point.
+    :rtype: tuple
+
+    |
+    """
+
+    n = len(repulsion_points)
+    return pointsSums(repulsion_points.position, birds, np.full(n, float(config.MIN_DIST_REPULSOR)), np.full(n, float(config.GROUP_DIST_REPULSOR)),
+                      config, repulsion_points.groups)
+
+
+def updateRepulsors(repulsion_points, birds, config, sums=None):
+    """
+    Updates direction, speed and position of the repulsion points, as in :meth:`bird.Bird.updateRepulsor`.
+
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param sums: sums given by :func:`repulsorSums`, when they have already been computed (then the birds are not used), defaults to None.
+    :type sums: tuple, optional
+
+    |
+    """
+
+    if len(repulsion_points) == 0:
+        return
+
+    if sums is None:
+        sums = repulsorSums(repulsion_points, birds, config)
+    avoidance_total, avoidance_counter, center_total, center_counter = sums
+
+    position, direction = repulsion_points.position, repulsion_points.direction
+    rules_vel = config.W_AVOIDANCE*avoidanceFromSums(direction, avoidance_total, avoidance_counter) \
+              + config.W_CENTER*centerFromSums(position, direction, center_total, center_counter)
+
+    repulsion_points.update(rules_vel, config)
+
+
+def updatePoints(attraction_points, repulsion_points, birds, config):
+    """
+    Updates the attraction points and then the repulsion points, as in :func:`bird.updatePoints`.
+    Points only move away from or towards the birds, so the sums of all of them are computed at once (see :func:`pointSums`).
+
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+
+    |
+    """
+
+    if len(attraction_points) == 0 and len(repulsion_points) == 0:
+        return
+
+    attraction_sums, repulsion_sums = pointSums(attraction_points, repulsion_points, birds, config)
+    updateAttractors(attraction_points, birds, config, attraction_sums)
+    updateRepulsors(repulsion_points, birds, config, repulsion_sums)
+
+
+def step(birds, attraction_points, repulsion_points, config=None, profiler=profiling.NULL):
+    """
+    Advances the simulation one step: updates the birds (all at once, or one after another if :py:data:`SYNCHRONOUS` is not set, see :py:mod:`parameters`),
+    then the attraction points and then the repulsion points.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
+    :param profiler: profiler of the phases of the step (see :func:`updateBirds`, plus ``points``), defaults to :py:data:`profiling.NULL` (not measured).
+    :type profiler: :class:`profiling.Profiler`, optional
+
+    |
+    """
+
+    if config is None:
+        config = param.Config()
+
+    if config.SYNCHRONOUS:
+        updateBirds(birds, attraction_points, repulsion_points, config, profiler)
+    else:
+        updateBirdsSequential(birds, attraction_points, repulsion_points, config, profiler)
+    with profiler.phase('points'):
+        updatePoints(attraction_points, repulsion_points, birds, config)
@@ -13,7 +13,8 @@ import pygame
 from pygame.locals import *
 
 import numpy as np
-import math
+import ctypes
+import functools
 
 
 # Container's vertices and edges
@@ -78,152 +79,289 @@ def initialize_window():
     glTranslatef(0, 0, -2000.0)
 
 
-def draw_triangle(head, tail_vertex1, tail_vertex2):
+def draw_text(lines, color=(0, 0, 0)):
     """
-    Draws a black triangle inisde the container.
+    Writes lines of text in the top left corner of the window, over everything else.
 
-    :param head: coordinates of the triangle's head vertex.
-    :type head: list
-    :param tail_vertex1: coordinates of a tail's vertex.
-    :type tail_vertex1: list
-    :param tail_vertex2: coordinates of the other tail's vertex.
-    :type tail_vertex2: list
+    :param lines: lines of text.
+    :type lines: list
+    :param color: RGB color of the text, defaults to black.
+    :type color: tuple, optional
 
     |
     """
 
-    glBegin(GL_TRIANGLES)
-    glColor3fv((0, 0, 0))
+    glDisable(GL_DEPTH_TEST)
+    glColor3fv(color)
+    for k, line in enumerate(lines):
+        glWindowPos2i(10, param.HEIGHT - 20 - 15*k)
+        for character in line:
+            glutBitmapCharacter(GLUT_BITMAP_9_BY_15, ord(character))
 
-    if param.DIM == 2:
-        glVertex2fv((int(head[0]), int(head[1])))
-        glVertex2fv((int(tail_vertex1[0]), int(tail_vertex1[1])))
-        glVertex2fv((int(tail_vertex2[0]), int(tail_vertex2[1])))
-    elif param.DIM == 3:
-        glVertex3fv((int(head[0]), int(head[1]), int(head[2])))
-        glVertex3fv((int(tail_vertex1[0]), int(
-            tail_vertex1[1]), int(tail_vertex1[2])))
-        glVertex3fv((int(tail_vertex2[0]), int(
-            tail_vertex2[1]), int(tail_vertex2[2])))
 
-    glEnd()
+COLORS = {'black': (0, 0, 0), 'green': (0, 0.54, 0.06), 'red': (1.0, 0, 0)}
 
 
-def draw_cone(pos, direction, radius, height, slices=7, stacks=1):
+@functools.lru_cache()
+def triangle_mesh(length=18, half_width=6):
     """
-    Draws a black cone inisde the container.
+    Builds the triangle used to draw a bird in 2D, pointing in the direction of x, with the head at the origin.
 
-    :param pos: coordinates of the cone's head vertex.
-    :type pos: list
-    :param direction: unitary vector that represents the direction in wich the cone is pointed.
-    :type direction: list
-    :param radius: radius of the cones base, in pixels.
-    :type radius: int
-    :param height: height of the cone, in pixels.
-    :type height: int
-    :param slices: Number of slices that will determine the cone's shape in the graphics, defaults to 7.
-    :type slices: int, optional
-    :param stacks: Number of stacks that will determine the cone's shape in the graphics, defaults to 1.
-    :type stacks: int, optional
+    :param length: distance from the head to the tail, in pixels, defaults to 18.
+    :type length: int, optional
+    :param half_width: half of the width of the tail, in pixels, defaults to 6.
+    :type half_width: int, optional
+    :return: vertices of the triangle, with shape (3, 2).
+    :rtype: numpy.ndarray
 
     |
     """
-    
-    glColor3fv((0, 0, 0))
 
-    z = np.array([0.0, 0.0, 1.0])
+    mesh = np.array([(0, 0), (-length, half_width), (-length, -half_width)], dtype=np.float32)
+    mesh.flags.writeable = False
+    return mesh
 
-    # The axis of rotation is the cross product between z and the direction
-    ax = np.cross(z, direction)
 
-    # Module of direction (just in case)
-    l_dir = math.sqrt(np.dot(direction, direction))
-    angle = 180.0/math.pi * math.acos(np.dot(z, direction)/l_dir)
+@functools.lru_cache()
+def cone_mesh(radius=6, height=18, slices=7):
+    """
+    Builds the cone used to draw a bird in 3D, pointing in the direction of z, with the center of the base at the origin.
+
+    :param radius: radius of the cone's base, in pixels, defaults to 6.
+    :type radius: int, optional
+    :param height: height of the cone, in pixels, defaults to 18.
+    :type height: int, optional
+    :param slices: number of slices of the cone, defaults to 7.
+    :type slices: int, optional
+    :return: vertices of the triangles of the side and the base, with shape (6*slices, 3).
+    :rtype: numpy.ndarray
+
+    |
+    """
 
-    glPushMatrix()
-    glTranslatef(pos[0], pos[1], pos[2])
-    glRotatef(angle, ax[0], ax[1], ax[2])
-    glutSolidCone(radius, height, slices, stacks)
-    #glutWireCone(radius, height, 5, stacks)
-    glPopMatrix()
+    angle = 2*np.pi*np.arange(slices + 1)/slices
+    base = np.stack([radius*np.cos(angle), radius*np.sin(angle), np.zeros(slices + 1)], axis=1)
+    apex = np.repeat([[0, 0, height]], slices, axis=0)
+    center = np.zeros((slices, 3))
 
+    side = np.stack([apex, base[:-1], base[1:]], axis=1)
+    bottom = np.stack([center, base[1:], base[:-1]], axis=1)
+    mesh = np.concatenate([side, bottom]).reshape(-1, 3).astype(np.float32)
+    mesh.flags.writeable = False
+    return mesh
 
-def draw_circle(position, color, radius=10, side_num=10):
+
+@functools.lru_cache()
+def circle_mesh(radius=10, side_num=10):
     """
-    Draws a circle of a given color.
+    Builds the circle used to draw a point in 2D, centered at the origin.
 
-    :param position: coordinates of the circle's center point.
-    :type position: list
-    :param color: the color of the circle. For example: 'red', 'green'.
-    :type color: str
-    :param radius: radius of the circle (in pixels), defaults to 10.
+    :param radius: radius of the circle, in pixels, defaults to 10.
     :type radius: int, optional
-    :param side_num: radius of the circle (in pixels), defaults to 10.
+    :param side_num: number of sides of the polygon, defaults to 10.
     :type side_num: int, optional
+    :return: vertices of the triangles, with shape (3*side_num, 2).
+    :rtype: numpy.ndarray
 
     |
     """
-    
-    
-    if color == 'red':
-        glColor3fv((1.0, 0, 0))
-    elif color == 'green':
-        glColor3fv((0, 0.54, 0.06))
-    else:
-        glColor3fv((0, 0, 0))
-
-    glBegin(GL_POLYGON)
-
-    for vertex in range(0, side_num):
-        angle = float(vertex) * 2.0 * np.pi / side_num
-        glVertex2f(position[0]+np.cos(angle)*radius, position[1]+np.sin(angle)*radius)
 
-    glEnd()
+    angle = 2*np.pi*np.arange(side_num + 1)/side_num
+    border = radius*np.stack([np.cos(angle), np.sin(angle)], axis=1)
+    mesh = np.stack([np.zeros((side_num, 2)), border[:-1], border[1:]], axis=1).reshape(-1, 2).astype(np.float32)
+    mesh.flags.writeable = False
+    return mesh
 
 
-def draw_sphere(position,color,r=10,lats=10,longs=10):
+@functools.lru_cache()
+def sphere_mesh(r=10, lats=10, longs=10):
     """
-    Draws a sphere of a given color.
+    Builds the sphere used to draw a point in 3D, centered at the origin.
 
-    :param position: coordinates of the sphere's center point.
-    :type position: list
-    :param color: the color of the sphere. For example: 'red', 'green'
-    :type color: str
-    :param r: radius of the sphere (in pixels), defaults to 10.
+    :param r: radius of the sphere, in pixels, defaults to 10.
     :type r: int, optional
-    :param lats: number of lats that will determine the sphere's shape in the graphics, defaults to 10.
+    :param lats: number of lats of the sphere, defaults to 10.
     :type lats: int, optional
-    :param longs: number of longs that will determine the sphere's shape in the graphics, defaults to 10.
+    :param longs: number of longs of the sphere, defaults to 10.
     :type longs: int, optional
+    :return: vertices of the triangles, with shape (6*lats*longs, 3).
+    :rtype: numpy.ndarray
 
     |
     """
 
-    if color == 'red':
-        glColor3fv((1.0, 0, 0))
-    elif color == 'green':
-        glColor3fv((0, 0.54, 0.06))
+    lat = np.pi*(-1/2 + np.arange(lats + 1)/lats)[:, None]
+    _long = 2*np.pi*np.arange(longs + 1)/longs
+    grid = r*np.stack([np.cos(lat)*np.cos(_long), np.cos(lat)*np.sin(_long), np.sin(lat)*np.ones_like(_long)], axis=2)
+
+    # Every quad between two lats and two longs is split in two triangles
+    p1, p2, p3, p4 = grid[:-1, :-1], grid[1:, :-1], grid[1:, 1:], grid[:-1, 1:]
+    mesh = np.stack([p1, p2, p4, p2, p3, p4], axis=2).reshape(-1, 3).astype(np.float32)
+    mesh.flags.writeable = False
+    return mesh
+
+
+def bird_vertices(position, direction):
+    """
+    Computes the vertices of the triangles (2D) or cones (3D) of all birds at once.
+
+    :param position: coordinates of the birds, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param direction: directions of the birds, as unit vectors, with shape (N, DIM).
+    :type direction: numpy.ndarray
+    :return: vertices, with shape (N*M, 3), where M is the number of vertices of the shape of a bird.
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    if position.shape[1] == 2:
+        mesh = triangle_mesh()
+        # Rotate the triangle so that x goes to the direction of the bird
+        perp = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+        vertices = position[:, None] + mesh[None, :, :1]*direction[:, None] + mesh[None, :, 1:]*perp[:, None]
+        vertices = np.concatenate([vertices, np.zeros(vertices.shape[:2] + (1,))], axis=2)
+
     else:
-        glColor3fv((0, 0, 0))
-
-    for i in range(lats+1):
-        lat1 = math.pi*(-1/2 + (i-1)/lats)
-        z1 =math.sin(lat1)
-        zr1 = math.cos(lat1)
-
-        lat2 = math.pi*(-1/2 + i/lats)
-        z2 = math.sin(lat2)
-        zr2 = math.cos(lat2)
-
-        glBegin(GL_QUAD_STRIP)
-        for j in range(longs+1):
-            _long = 2*math.pi*(j-1)/longs
-            x = math.cos(_long)
-            y = math.sin(_long)
-
-            glNormal3f(position[0] + x*zr1, position[1] + y*zr1, position[2] + z1)
-            glVertex3f(position[0] + r*x*zr1, position[1] + r*y*zr1, position[2] + r*z1)
-            glNormal3f(position[0] + x*zr2, position[1] + y*zr2, position[2] + z2)
-            glVertex3f(position[0] + r*x*zr2, position[1] + r*y*zr2, position[2] + r*z2)
-        
-        glEnd()
\ No newline at end of file
+        mesh = cone_mesh()
+        # Any two unit vectors orthogonal to the direction (and to each other) give the same cone
+        reference = np.where(np.abs(direction[:, :1]) < 0.9, [[1.0, 0, 0]], [[0, 1.0, 0]])
+        u = np.cross(direction, reference)
+        u /= np.sqrt(np.einsum('ij,ij->i', u, u))[:, None]
+        v = np.cross(direction, u)
+        vertices = position[:, None] + mesh[None, :, :1]*u[:, None] + mesh[None, :, 1:2]*v[:, None] + mesh[None, :, 2:]*direction[:, None]
+
+    return vertices.reshape(-1, 3)
+
+
+def point_vertices(position):
+    """
+    Computes the vertices of the circles (2D) or spheres (3D) of attraction or repulsion points at once.
+
+    :param position: coordinates of the points, with shape (P, DIM).
+    :type position: numpy.ndarray
+    :return: vertices, with shape (P*M, 3), where M is the number of vertices of the shape of a point.
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    mesh = circle_mesh() if position.shape[1] == 2 else sphere_mesh()
+    vertices = (position[:, None] + mesh[None]).reshape(-1, position.shape[1])
+    if position.shape[1] == 2:
+        vertices = np.concatenate([vertices, np.zeros((len(vertices), 1))], axis=1)
+    return vertices
+
+
+class Renderer:
+    """
+    The class that draws the birds, attraction points and repulsion points with a single draw call.
+    The vertices of every shape are computed with numpy from meshes that are built only once,
+    and uploaded to one vertex buffer object, together with their colors, every frame.
+    The window uses the fixed function pipeline of OpenGL, which has no per instance attributes,
+    so the meshes are placed on the CPU instead of with an instanced draw call.
+
+    It has to be created after the window (see :func:`initialize_window`).
+
+    |
+    """
+
+    def __init__(self):
+        """
+        Constructor for the renderer class.
+
+        |
+        """
+
+        self.vbo = glGenBuffers(1)
+        self.capacity = 0
+        self.data = np.empty((0, 6), dtype=np.float32)
+        self.count = 0
+
+
+    def draw(self, birds, attraction_points, repulsion_points):
+        """
+        Draws the birds as black triangles (2D) or cones (3D), and the attraction and repulsion points as green and red circles (2D) or spheres (3D).
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :param attraction_points: the attraction points of the simulation.
+        :type attraction_points: :class:`flock.Flock`
+        :param repulsion_points: the repulsion points of the simulation.
+        :type repulsion_points: :class:`flock.Flock`
+
+        |
+        """
+
+        self.update(birds, attraction_points, repulsion_points)
+        self.render()
+
+
+    def update(self, birds, attraction_points, repulsion_points):
+        """
+        Computes the vertices of the birds and the points, without drawing them (see :meth:`render`).
+        The arrays of the birds and the points are not used afterwards, so they can change once it returns.
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :param attraction_points: the attraction points of the simulation.
+        :type attraction_points: :class:`flock.Flock`
+        :param repulsion_points: the repulsion points of the simulation.
+        :type repulsion_points: :class:`flock.Flock`
+
+        |
+        """
+
+        parts = ((bird_vertices(birds.position, birds.direction), COLORS['black']),
+                 (point_vertices(attraction_points.position), COLORS['green']),
+                 (point_vertices(repulsion_points.position), COLORS['red']))
+
+        # Vertices are interleaved with their colors: x, y, z, r, g, b
+        count = sum(len(vertices) for vertices, color in parts)
+        if len(self.data) < count:
+            self.data = np.empty((count, 6), dtype=np.float32)
+        start = 0
+        for vertices, color in parts:
+            self.data[start:start + len(vertices), :3] = vertices
+            self.data[start:start + len(vertices), 3:] = color
+            start += len(vertices)
+        self.count = count
+
+
+    def render(self):
+        """
+        Draws the vertices computed by the last call to :meth:`update`.
+
+        |
+        """
+
+        count = self.count
+        if count == 0:
+            return
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        if self.data.nbytes > self.capacity:
+            self.capacity = self.data.nbytes
+            glBufferData(GL_ARRAY_BUFFER, self.capacity, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, count*self.data.itemsize*6, self.data[:count])
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 6*self.data.itemsize, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, 6*self.data.itemsize, ctypes.c_void_p(3*self.data.itemsize))
+
+        glDrawArrays(GL_TRIANGLES, 0, count)
+
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+    def delete(self):
+        """
+        Frees the vertex buffer object.
+
+        |
+        """
+
+        glDeleteBuffers(1, [self.vbo])
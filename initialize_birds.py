@@ -5,45 +5,53 @@ Initialization of birds.
 """
 
 import bird
+import flock
 import parameters as param
 import math
 import random
 
+import numpy as np
 
-def generateBirds():
+
+def generateBirds(config=None):
     """
     Generates a list of birds. Positions and velocity are random.
 
+    :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
     :return: list of instances of the class :class:`bird.Bird`.
     :rtype: list
 
     |
     """
 
+    if config is None:
+        config = param.Config()
+
     birds = []
-    for i in range(param.NUM_BIRDS):
-        if param.DIM == 2:
+    for i in range(config.NUM_BIRDS):
+        if config.DIM == 2:
             position = [
-                random.randint(param.X_MIN+param.BOUNDARY_DELTA, param.X_MAX-param.BOUNDARY_DELTA),
-                random.randint(param.Y_MIN+param.BOUNDARY_DELTA, param.Y_MAX-param.BOUNDARY_DELTA)
+                random.randint(config.X_MIN+config.BOUNDARY_DELTA, config.X_MAX-config.BOUNDARY_DELTA),
+                random.randint(config.Y_MIN+config.BOUNDARY_DELTA, config.Y_MAX-config.BOUNDARY_DELTA)
             ]
-        elif param.DIM == 3:
+        elif config.DIM == 3:
             position = [
-                random.randint(param.X_MIN+param.BOUNDARY_DELTA, param.X_MAX-param.BOUNDARY_DELTA),
-                random.randint(param.Y_MIN+param.BOUNDARY_DELTA, param.Y_MAX-param.BOUNDARY_DELTA),
-                random.randint(param.Z_MIN, param.Z_MAX)
+                random.randint(config.X_MIN+config.BOUNDARY_DELTA, config.X_MAX-config.BOUNDARY_DELTA),
+                random.randint(config.Y_MIN+config.BOUNDARY_DELTA, config.Y_MAX-config.BOUNDARY_DELTA),
+                random.randint(config.Z_MIN, config.Z_MAX)
             ]
 
 
         # to place along a line: position[1], position[2] = 0,0
         position[1] = 0
-        if param.DIM == 3:
+        if config.DIM == 3:
             position[2] = 0
         
         
-        speed = random.randint(param.MIN_VEL, param.MAX_VEL)
+        speed = random.randint(config.MIN_VEL, config.MAX_VEL)
 
-        if param.DIM == 2:
+        if config.DIM == 2:
             direction_x = random.choice([-1,1])*random.random()
             direction_y = random.choice([-1,1])*math.sqrt(1-direction_x**2)
 
@@ -66,24 +74,29 @@ def generateBirds():
     return birds
 
 
-def generateAttractionPoints():
+def generateAttractionPoints(config=None):
     """
     Generates a list of attraction points.
 
+    :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
     :return: list of instances of the class :class:`bird.Bird`, with the attribute :py:data:`type` assigned to -1 (which represents an Attraction Point).
     :rtype: list
 
     |
     """
 
+    if config is None:
+        config = param.Config()
+
     attraction_points = []
-    i = param.NUM_BIRDS
-    for point in param.ATTRACTION_POINTS:
+    i = config.NUM_BIRDS
+    for point in config.ATTRACTION_POINTS:
 
         position = list(point)
-        speed = random.randint(param.MIN_VEL, param.MAX_VEL)
+        speed = random.randint(config.MIN_VEL, config.MAX_VEL)
 
-        if param.DIM == 2:
+        if config.DIM == 2:
             direction_x = random.choice([-1,1])*random.random()
             direction_y = random.choice([-1,1])*math.sqrt(1-direction_x**2)
 
@@ -108,24 +121,29 @@ def generateAttractionPoints():
     return attraction_points
 
 
-def generateRepulsionPoints():
+def generateRepulsionPoints(config=None):
     """
     Generates a list of repulsion points.
 
+    :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
     :return: list of instances of the class :class:`bird.Bird`, with the attribute :py:data:`type` assigned to -2 (which represents an Repulsion Point).
     :rtype: list
 
     |
     """
 
+    if config is None:
+        config = param.Config()
+
     repulsion_points = []
-    i = param.NUM_BIRDS + len(param.ATTRACTION_POINTS)
-    for point in param.REPULSION_POINTS:
+    i = config.NUM_BIRDS + len(config.ATTRACTION_POINTS)
+    for point in config.REPULSION_POINTS:
 
         position = list(point)
-        speed = random.randint(param.MIN_VEL, param.MAX_VEL)
+        speed = random.randint(config.MIN_VEL, config.MAX_VEL)
 
-        if param.DIM == 2:
+        if config.DIM == 2:
             direction_x = random.choice([-1,1])*random.random()
             direction_y = random.choice([-1,1])*math.sqrt(1-direction_x**2)
 
@@ -148,3 +166,95 @@ def generateRepulsionPoints():
         i += 1
 
     return repulsion_points
+
+
+def generator(seed: int = None, run_id: int = 0):
+    """
+    Builds the random generator of a run, which only depends on the seed and the number of the run.
+    Runs with different numbers get independent random values, however they are split among processes.
+
+    :param seed: seed of the simulation, defaults to None (not reproducible).
+    :type seed: int, optional
+    :param run_id: number of the run, defaults to 0.
+    :type run_id: int, optional
+    :return: the random generator.
+    :rtype: numpy.random.Generator
+
+    |
+    """
+
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    return np.random.default_rng(np.random.SeedSequence([seed, run_id]))
+
+
+def randomDirections(n: int, rng, dim: int):
+    """
+    Generates random directions, as unit vectors, in the same way as :func:`generateBirds` but without a rejection loop:
+    the y coordinate is uniformly distributed among the values that keep the vector inside the unit circle.
+
+    :param n: number of directions.
+    :type n: int
+    :param rng: random generator.
+    :type rng: numpy.random.Generator
+    :param dim: dimension of the simulation.
+    :type dim: int
+    :return: directions, with shape (n, dim).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    signs = rng.choice([-1.0, 1.0], (n, dim))
+    direction_x = rng.random(n)
+
+    if dim == 2:
+        direction_y = np.sqrt(1 - direction_x**2)
+        return signs*np.stack([direction_x, direction_y], axis=1)
+
+    direction_y = rng.random(n)*np.sqrt(1 - direction_x**2)
+    direction_z = np.sqrt(np.maximum(1 - direction_x**2 - direction_y**2, 0))
+    return signs*np.stack([direction_x, direction_y, direction_z], axis=1)
+
+
+def generateState(config=None, seed: int = None, run_id: int = 0, rng=None):
+    """
+    Generates the birds, attraction points and repulsion points of a new simulation at once, with the same distributions as
+    :func:`generateBirds`, :func:`generateAttractionPoints` and :func:`generateRepulsionPoints`.
+    The result only depends on the parameters, the seed and the number of the run (see :func:`generator`).
+
+    :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
+    :param seed: seed of the simulation, defaults to None (not reproducible).
+    :type seed: int, optional
+    :param run_id: number of the run, defaults to 0.
+    :type run_id: int, optional
+    :param rng: random generator that is used instead of the one given by the seed and the number of the run, defaults to None.
+    :type rng: numpy.random.Generator, optional
+    :return: the birds, the attraction points and the repulsion points, as instances of the class :class:`flock.Flock`.
+    :rtype: tuple
+
+    |
+    """
+
+    if config is None:
+        config = param.Config()
+
+    if rng is None:
+        rng = generator(seed, run_id)
+    n = config.NUM_BIRDS
+
+    # Birds are placed along a line, as in generateBirds
+    position = np.zeros((n, config.DIM))
+    position[:, 0] = rng.integers(math.ceil(config.X_MIN + config.BOUNDARY_DELTA), math.floor(config.X_MAX - config.BOUNDARY_DELTA),
+                                  n, endpoint=True)
+    birds = flock.Flock(position, randomDirections(n, rng, config.DIM),
+                        rng.integers(config.MIN_VEL, config.MAX_VEL, n, endpoint=True), type=1)
+
+    points = []
+    for type, points_position in ((-1, config.ATTRACTION_POINTS), (-2, config.REPULSION_POINTS)):
+        m = len(points_position)
+        points.append(flock.Flock(np.array(points_position, dtype=float).reshape(m, config.DIM), randomDirections(m, rng, config.DIM),
+                                  rng.integers(config.MIN_VEL, config.MAX_VEL, m, endpoint=True), type))
+
+    return (birds, *points)
@@ -0,0 +1,266 @@
+"""
+.. module:: kernels
+
+Compiled versions of the rules of the birds (avoidance, center, copy and view), used by :func:`flock.updateBirds` when `numba <https://numba.pydata.org>`_ is installed.
+They loop over the neighbours of every bird, stored as compressed rows (see :class:`neighbours.NeighbourList`), without building temporary arrays for all pairs.
+Without numba, the NumPy versions in :py:mod:`flock` are used.
+
+They give the same results as the methods of :class:`bird.Bird`, which can be checked with :func:`check`, or from the command line::
+
+    python kernels.py
+"""
+
+import parameters as param
+import bird
+import flock
+import neighbours
+import profiling
+
+import math
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+ENABLED = numba is not None
+
+
+def jit(function):
+    """
+    Compiles a function with numba, if it is installed.
+    Compiled functions release the GIL, so they can run on several threads at the same time (see :py:mod:`parallel`).
+
+    :param function: function to compile.
+    :type function: function
+    :return: the compiled function, or the same function without numba.
+    :rtype: function
+
+    |
+    """
+
+    if numba is None:
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+@jit
+def avoidanceKernel(direction, offsets, displacement, dist_sq, min_dist):
+    n, dim = direction.shape
+    vel = direction.copy()
+
+    for k in range(n):
+        start, end = offsets[k], offsets[k+1]
+        if start == end:
+            continue
+        for d in range(dim):
+            vel[k, d] = 0.0
+        for p in range(start, end):
+            mod_dist = math.sqrt(dist_sq[p])
+            factor = (min_dist - mod_dist)/mod_dist
+            for d in range(dim):
+                vel[k, d] -= factor*displacement[p, d]
+        for d in range(dim):
+            vel[k, d] /= end - start
+
+    return vel
+
+
+@jit
+def centerKernel(position, direction, offsets, displacement):
+    n, dim = direction.shape
+    vel = direction.copy()
+
+    for k in range(n):
+        start, end = offsets[k], offsets[k+1]
+        if start == end:
+            continue
+        for d in range(dim):
+            total = 0.0
+            for p in range(start, end):
+                total += displacement[p, d]
+            # As in bird.Bird.center, every coordinate of the center is measured from the bird's first coordinate
+            vel[k, d] = total/(end - start) + position[k, d] - position[k, 0]
+
+    return vel
+
+
+@jit
+def copyKernel(direction, neighbour_direction, offsets, indices):
+    n, dim = direction.shape
+    vel = direction.copy()
+
+    for k in range(n):
+        start, end = offsets[k], offsets[k+1]
+        if start == end:
+            continue
+        for d in range(dim):
+            total = 0.0
+            for p in range(start, end):
+                total += neighbour_direction[indices[p], d]
+            vel[k, d] = total/(end - start)
+
+    return vel
+
+
+@jit
+def viewKernel(direction, offsets, displacement, dist_sq, view_dist, cos_view_angle, delta):
+    n, dim = direction.shape
+    vel = direction.copy()
+    total = np.zeros(dim)
+    hits = 0
+
+    for k in range(n):
+        norm_self = 0.0
+        for d in range(dim):
+            norm_self += direction[k, d]**2
+        norm_self = math.sqrt(norm_self)
+
+        counter = 0
+        orientation = 0.0
+        total[:] = 0.0
+
+        for p in range(offsets[k], offsets[k+1]):
+            norm_dist = math.sqrt(dist_sq[p])
+            div = 0.0
+            for d in range(dim):
+                div += direction[k, d]*displacement[p, d]
+            div /= norm_self*norm_dist
+            if div <= -1:
+                div = -1 + delta
+            elif div >= 1:
+                div = 1 - delta
+
+            # Cosine of the angle between the bird's direction and the neighbour (the angle is never compared directly)
+            if div <= cos_view_angle:
+                continue
+            counter += 1
+
+            if dim == 2:
+                # The angle given by acos is always positive, so every neighbour turns the bird to the same side
+                orientation += view_dist - norm_dist
+            else:
+                norm_view_vel = 0.0
+                for d in range(dim):
+                    norm_view_vel += (direction[k, d] - displacement[p, d]*norm_self/(norm_dist*div))**2
+                norm_view_vel = math.sqrt(norm_view_vel)
+                for d in range(dim):
+                    view_vel = direction[k, d] - displacement[p, d]*norm_self/(norm_dist*div)
+                    total[d] += view_vel*(view_dist - norm_view_vel)/norm_view_vel
+
+        if counter != 0:
+            hits += counter
+            if dim == 2:
+                vel[k, 0] = orientation*direction[k, 1]/counter
+                vel[k, 1] = -orientation*direction[k, 0]/counter
+            else:
+                for d in range(dim):
+                    vel[k, d] = total[d]/counter
+
+    return vel, hits
+
+
+def avoidance(direction, close_neighbours, config):
+    """
+    Compiled version of :func:`flock.avoidance`.
+
+    |
+    """
+
+    return avoidanceKernel(direction, close_neighbours.offsets, close_neighbours.displacement, close_neighbours.dist_sq,
+                           float(config.MIN_DIST))
+
+
+def center(position, direction, group_birds, config):
+    """
+    Compiled version of :func:`flock.center`.
+
+    |
+    """
+
+    return centerKernel(position, direction, group_birds.offsets, group_birds.displacement)
+
+
+def copy(direction, neighbour_direction, group_birds, config):
+    """
+    Compiled version of :func:`flock.copy`.
+
+    |
+    """
+
+    return copyKernel(direction, neighbour_direction, group_birds.offsets, group_birds.indices)
+
+
+def view(direction, view_birds, config, profiler=profiling.NULL):
+    """
+    Compiled version of :func:`flock.view`.
+
+    |
+    """
+
+    vel, hits = viewKernel(direction, view_birds.offsets, view_birds.displacement, view_birds.dist_sq,
+                           float(config.VIEW_DIST), config.COS_VIEW_ANGLE, config.DELTA)
+    profiler.count('view_hits', hits)
+    return vel
+
+
+def check(n: int = 200, seed: int = 0, compiled: bool = True, config=None):
+    """
+    Checks that the rules give the same results as the methods of :class:`bird.Bird`, for random birds.
+    The methods of the birds are run with the same configuration (see :func:`parameters.use`).
+
+    :param n: number of birds, defaults to 200.
+    :type n: int, optional
+    :param seed: seed of the random positions and directions, defaults to 0.
+    :type seed: int, optional
+    :param compiled: whether the compiled rules are checked (otherwise, the NumPy rules of :py:mod:`flock` are), defaults to True.
+    :type compiled: bool, optional
+    :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
+    :return: the largest difference with the methods of the birds, for every rule.
+    :rtype: dict
+
+    |
+    """
+
+    if config is None:
+        config = param.Config()
+    rng = np.random.default_rng(seed)
+
+    # Birds close enough to have neighbours for every rule
+    position = rng.uniform(-2*config.GROUP_DIST, 2*config.GROUP_DIST, (n, config.DIM))
+    direction = rng.standard_normal((n, config.DIM))
+    direction /= flock.norm(direction)[:, None]
+    birds = [bird.Bird(k, list(position[k]), list(direction[k]), config.MIN_VEL, 1) for k in range(n)]
+
+    grid = neighbours.SpatialGrid(position, config)
+    group_birds, close_neighbours, view_birds = grid.query(position, (config.GROUP_DIST, config.MIN_DIST, min(config.VIEW_DIST, config.GROUP_DIST)),
+                                                           exclude_self=True)
+
+    rules = (avoidance, center, copy, view) if compiled else (flock.avoidance, flock.center, flock.copy, flock.view)
+    got = {
+        'avoidance': rules[0](direction, close_neighbours, config),
+        'center': rules[1](position, direction, group_birds, config),
+        'copy': rules[2](direction, direction, group_birds, config),
+        'view': rules[3](direction, view_birds, config),
+    }
+
+    expected = {name: np.empty((n, config.DIM)) for name in got}
+    with param.use(config):
+        for k, b in enumerate(birds):
+            group = [birds[j] for j in group_birds[k]]
+            expected['avoidance'][k] = b.avoidance([birds[j] for j in close_neighbours[k]])
+            expected['center'][k] = b.center(group)
+            expected['copy'][k] = b.copy(group)
+            expected['view'][k] = b.view(group)
+
+    return {name: float(np.abs(got[name] - expected[name]).max()) for name in got}
+
+
+if __name__ == "__main__":
+    print('numba', 'enabled' if ENABLED else 'not installed')
+    for name, error in check().items():
+        print('{:<10} largest difference {:.3g}'.format(name, error))
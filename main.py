@@ -5,8 +5,12 @@ File where simulation is runned.
 """
 
 import parameters as param
-import bird
-import initialize_birds
+import simulation
+import recording
+import profiling
+import scheduler
+import parallel
+import shared
 import graphics
 
 from OpenGL.GL import *
@@ -15,7 +19,8 @@ from OpenGL.GLUT import *
 import pygame
 from pygame.locals import *
 
-import math
+import argparse
+import time
 
 
 assert param.DIM == 2 or param.DIM == 3
@@ -26,29 +31,69 @@ for repul_point in param.REPULSION_POINTS:
     assert len(repul_point) == param.DIM
 
 
-def main():
+def main(record=None, replay=None, profile=False, profile_out=None, substeps=1, threaded=False, sequential=False, workers=1, process=False):
     """
     Function that has to be executed to run the simulation.
 
+    :param record: path of a file where every frame is recorded (see :py:mod:`recording`), defaults to None (not recorded).
+    :type record: str, optional
+    :param replay: path of a recording that is shown instead of running the simulation, defaults to None.
+    :type replay: str, optional
+    :param profile: whether the time of every phase of a frame is shown on the screen (see :py:mod:`profiling`), defaults to False.
+    :type profile: bool, optional
+    :param profile_out: path of a file (CSV, or JSON if it ends with ``.json``) where the time of every phase is written when the window is closed, defaults to None.
+    :type profile_out: str, optional
+    :param substeps: number of steps of the simulation per frame (see :class:`scheduler.Scheduler`), defaults to 1.
+    :type substeps: int, optional
+    :param threaded: whether the steps run on their own thread, apart from drawing, defaults to False.
+    :type threaded: bool, optional
+    :param sequential: whether birds are updated one after another, instead of all at once (see :py:data:`SYNCHRONOUS` in :py:mod:`parameters`), defaults to False.
+    :type sequential: bool, optional
+    :param workers: number of threads that run every step (see :py:mod:`parallel`), defaults to 1.
+    :type workers: int, optional
+    :param process: whether the simulation runs in a process of its own, which hands its frames over in shared memory (see :py:mod:`shared`), defaults to False.
+    :type process: bool, optional
+
     |
     """
     # Initialize window and display
     glutInit()
     glutInitDisplayMode(GLUT_RGBA | GLUT_DOUBLE | GLUT_DEPTH)
     graphics.initialize_window()
+    renderer = graphics.Renderer()
     clock = pygame.time.Clock()
 
     # Initialize birds, attraction points and repulsion points
-    birds = initialize_birds.generateBirds()
-    attraction_points = initialize_birds.generateAttractionPoints()
-    repulsion_points = initialize_birds.generateRepulsionPoints()
-
-    # Initialize lists of neighbours and group mates for each bird
-    group_birds = []
-    close_neighbours = []
-    for i in range(len(birds)):
-        group_birds.append([])
-        close_neighbours.append([])
+    config = param.Config(SYNCHRONOUS=not sequential)
+    birds, attraction_points, repulsion_points = simulation.initialize(config)
+
+    recorder = None
+    if replay is not None:
+        replay = recording.Replay(replay)
+        if replay.dim != param.DIM or len(replay) == 0:
+            raise ValueError('the recording has to have frames of dimension {}'.format(param.DIM))
+        frame = 0
+        birds, attraction_points, repulsion_points = replay.frame(frame)
+    elif record is not None:
+        recorder = recording.Recorder(record, birds, attraction_points, repulsion_points)
+        recorder.record(birds, attraction_points, repulsion_points)
+
+    profiler = profiling.Profiler() if profile or profile_out is not None else profiling.NULL
+
+    # Steps run at a fixed rate, apart from frames (the profiler is not shared with the thread of the steps)
+    pool = None
+    schedule = None
+    separate = None
+    if process and replay is None:
+        separate = shared.SimulationProcess(config, substeps=substeps, workers=workers)
+    elif replay is None:
+        pool = parallel.Pool(workers) if workers > 1 else None
+        schedule = scheduler.Scheduler(birds, attraction_points, repulsion_points, config, substeps,
+                                       on_step=recorder.record if recorder is not None else None,
+                                       profiler=profiling.NULL if threaded else profiler, pool=pool)
+        if threaded:
+            schedule.start()
+    last = time.perf_counter()
 
 
     # Run simulation
@@ -58,7 +103,9 @@ def main():
 
 
         # Pygame events
-        for event in pygame.event.get():
+        with profiler.phase('events'):
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 run = False
             
@@ -72,11 +119,30 @@ def main():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     # Leave
+                    if schedule is not None:
+                        schedule.stop()
+                    if pool is not None:
+                        pool.close()
+                    if separate is not None:
+                        separate.close()
+                    if recorder is not None:
+                        recorder.close()
+                    if profile_out is not None:
+                        profiler.write(profile_out)
+                    renderer.delete()
                     pygame.quit()
                     quit()
                 if event.key == pygame.K_r:
-                    # Reset simulation
-                    birds = initialize_birds.generateBirds()
+                    # Reset simulation (or replay from the start)
+                    if replay is not None:
+                        frame = -1
+                    elif separate is not None:
+                        separate.reset()
+                    else:
+                        schedule.reset(simulation.initialize(config)[0], schedule.attraction_points, schedule.repulsion_points)
+                if event.key == pygame.K_p and profiler.enabled:
+                    # Show or hide the profiling overlay
+                    profile = not profile
 
                 if param.DIM == 3:
                     # Rotations of cube if keys are pressed
@@ -118,105 +184,85 @@ def main():
 
 
         # Draw container
-        glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
-        glClearColor(1,1,1,0)
-
-        graphics.draw_container()
-
-
-
-        # Update lists of neighbours and mates
-
-        for i in range(len(birds)):
-            for bird in birds:
-                if param.DIM == 2:
-                    if bird.index == birds[i].index or (bird.position[0] == birds[i].position[0] and bird.position[1] == birds[i].position[1]):
-                        continue
-                    if math.sqrt((birds[i].position[0]-bird.position[0])**2+(birds[i].position[1]-bird.position[1])**2)<param.GROUP_DIST:
-                        group_birds[i].append(bird)
-                    if math.sqrt((birds[i].position[0]-bird.position[0])**2+(birds[i].position[1]-bird.position[1])**2)<param.MIN_DIST:
-                        close_neighbours[i].append(bird)
-                elif param.DIM == 3:
-                    if bird.index == birds[i].index or (bird.position[0] == birds[i].position[0] and bird.position[1] == birds[i].position[1] and bird.position[2] == birds[i].position[2]):
-                        continue
-                    if math.sqrt((birds[i].position[0]-bird.position[0])**2+(birds[i].position[1]-bird.position[1])**2+(birds[i].position[2]-bird.position[2])**2)<param.GROUP_DIST:
-                        group_birds[i].append(bird)
-                    if math.sqrt((birds[i].position[0]-bird.position[0])**2+(birds[i].position[1]-bird.position[1])**2+(birds[i].position[2]-bird.position[2])**2)<param.MIN_DIST:
-                        close_neighbours[i].append(bird)
-
-
-
-        # Draw birds
-
-        if param.DIM == 2:
-            for bird in birds:
-                head = bird.position
-                tail_centre = (bird.position[0]-18*bird.direction[0],
-                            bird.position[1]-18*bird.direction[1]
-                            )
-
-
-                perp_vector = [bird.direction[1],
-                            -bird.direction[0]
-                            ]
-
-                tail_vertex1 = (tail_centre[0]-6*perp_vector[0],
-                                tail_centre[1]-6*perp_vector[1]
-                                )
-                tail_vertex2 = (tail_centre[0]+6*perp_vector[0],
-                                tail_centre[1]+6*perp_vector[1]
-                                )
-
-
-                # Draw triangle
-                graphics.draw_triangle(head,tail_vertex1,tail_vertex2)
-
-        elif param.DIM == 3:
-            for bird in birds:
-                head = bird.position
-                
-                # Draw cone
-                graphics.draw_cone(pos = head, direction = bird.direction, radius = 6, height = 18)
-        
-
-
-        # Draw attraction and repulsion points
-
-        if param.DIM == 2:
-            for point in attraction_points:
-                graphics.draw_circle(point.position, 'green')
-            for point in repulsion_points:
-                graphics.draw_circle(point.position, 'red')
-        
-        elif param.DIM == 3:
-            for point in attraction_points:
-                graphics.draw_sphere(point.position, 'green')
-            for point in repulsion_points:
-                graphics.draw_sphere(point.position, 'red')
-                
-
-
-        # Update birds
-
-        for i in range(len(birds)):
-            birds[i].update(close_neighbours[i],group_birds[i], attraction_points, repulsion_points)
-
-        
-        # Update attraction and repulsion points
-
-        for i in range(len(attraction_points)):
-            attraction_points[i].updateAttractor(birds)
-
-        for i in range(len(repulsion_points)):
-            repulsion_points[i].updateRepulsor(birds)
-
-        pygame.display.flip()
-        clock.tick(param.FPS)
-
-
+        with profiler.phase('container'):
+            glClear(GL_COLOR_BUFFER_BIT|GL_DEPTH_BUFFER_BIT)
+            glClearColor(1,1,1,0)
+
+            graphics.draw_container()
+
+
+
+        # Draw birds, attraction points and repulsion points
+
+        with profiler.phase('draw'):
+            if separate is not None:
+                # The vertices are built from the last frame in shared memory, without copying it. The simulation process may write
+                # the slot again meanwhile, and then they are built again from the new last frame (if none is complete, the previous ones are drawn)
+                for attempt in range(shared.RETRIES):
+                    number, state = separate.latest()
+                    if state is None:
+                        break
+                    renderer.update(*state)
+                    if separate.valid(number):
+                        break
+                renderer.render()
+            else:
+                if schedule is not None:
+                    birds, attraction_points, repulsion_points = schedule.state()
+                renderer.draw(birds, attraction_points, repulsion_points)
+
+        if profile:
+            graphics.draw_text(profiler.lines())
+
+
+
+        # Update birds, attraction points and repulsion points
+
+        if replay is not None:
+            frame = (frame + 1) % len(replay)
+            birds, attraction_points, repulsion_points = replay.frame(frame)
+        elif schedule is not None and not threaded:
+            now = time.perf_counter()
+            schedule.advance(now - last)
+            last = now
+
+        with profiler.phase('flip'):
+            pygame.display.flip()
+        with profiler.phase('wait'):
+            clock.tick(param.FPS)
+        profiler.endFrame()
+
+
+    if schedule is not None:
+        schedule.stop()
+    if pool is not None:
+        pool.close()
+    if separate is not None:
+        separate.close()
+    if recorder is not None:
+        recorder.close()
+    if profile_out is not None:
+        profiler.write(profile_out)
+    renderer.delete()
     pygame.quit()
     quit()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the bird flock simulation.')
+    parser.add_argument('--record', default=None, metavar='PATH', help='file where every frame is recorded')
+    parser.add_argument('--replay', default=None, metavar='PATH', help='recording that is shown instead of running the simulation')
+    parser.add_argument('--profile', action='store_true', help='show the time of every phase of a frame (press P to hide it)')
+    parser.add_argument('--profile-out', default=None, metavar='PATH', help='CSV or JSON file where the time of every phase is written')
+    parser.add_argument('--substeps', type=int, default=1, help='number of steps of the simulation per frame')
+    parser.add_argument('--threaded', action='store_true', help='run the steps of the simulation on their own thread')
+    parser.add_argument('--sequential', action='store_true',
+                        help='update birds one after another, as the first versions of the simulation did, instead of all at once')
+    parser.add_argument('--workers', type=int, default=1, metavar='N', help='number of threads that run every step')
+    parser.add_argument('--process', action='store_true',
+                        help='run the simulation in a process of its own, which hands its frames over in shared memory')
+    args = parser.parse_args()
+    if args.process and args.record is not None:
+        parser.error('--record cannot be used with --process')
+
+    main(args.record, args.replay, args.profile, args.profile_out, args.substeps, args.threaded, args.sequential, args.workers, args.process)
\ No newline at end of file
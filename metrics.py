@@ -0,0 +1,263 @@
+"""
+.. module:: metrics
+
+Metrics of the behaviour of a flock: polarization, distance to the nearest neighbour, number of groups and distance to the attraction and repulsion points.
+
+All of them are computed from the same state, the positions after the last step. The group mates of every bird at those positions are kept by
+the birds with the grid that is used in the next step, so they are searched only once for all the metrics (see :meth:`flock.Flock.groupMates`).
+A :func:`stage` receives the state after every step, computes the metrics every some steps and writes them at once,
+so the history of the simulation is never kept in memory. It can be used from the command line, for example::
+
+    python simulation.py --steps 1000 --metrics metrics.csv --metrics-every 10
+"""
+
+import flock
+import neighbours
+
+import csv
+import json
+import sys
+
+import numpy as np
+
+
+def polarization(birds, attraction_points, repulsion_points, config):
+    """
+    Computes how aligned the birds are: the module of the average direction (1 if all birds fly in the same direction, close to 0 if directions are random).
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: the polarization.
+    :rtype: dict
+
+    |
+    """
+
+    return {'polarization': float(flock.norm(birds.direction.mean(axis=0, keepdims=True))[0])}
+
+
+def segmentMinimum(values, offsets):
+    """
+    Computes the minimum of the values of every bird in a list of neighbours.
+
+    :param values: a value for every pair of neighbours.
+    :type values: numpy.ndarray
+    :param offsets: offsets of the neighbours of every bird (see :class:`neighbours.NeighbourList`).
+    :type offsets: numpy.ndarray
+    :return: the minimum of every bird with neighbours, and which birds have neighbours.
+    :rtype: tuple
+
+    |
+    """
+
+    found = np.diff(offsets) != 0
+    if not found.any():
+        return np.empty(0, dtype=values.dtype), found
+    # Birds without neighbours have empty segments, so they are skipped
+    return np.minimum.reduceat(values, offsets[:-1][found]), found
+
+
+def nearestNeighbour(birds, attraction_points, repulsion_points, config):
+    """
+    Computes the average distance from every bird to its nearest neighbour.
+    Only group mates are considered, so birds without any closer than :py:data:`parameters.GROUP_DIST` are counted apart.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: the average distance to the nearest neighbour, and the fraction of isolated birds.
+    :rtype: dict
+
+    |
+    """
+
+    group_birds = birds.groupMates(config)
+    minimum, found = segmentMinimum(group_birds.dist_sq, group_birds.offsets)
+    return {
+        'nearest_neighbour': float(np.sqrt(minimum).mean()) if len(minimum) else float('nan'),
+        'isolated': float(1 - found.mean()) if len(found) else float('nan'),
+    }
+
+
+def groupLabels(n: int, group_birds):
+    """
+    Finds the groups of birds: two birds are in the same group if they are connected by a chain of birds closer than :py:data:`parameters.GROUP_DIST`.
+    Labels are propagated between neighbours until every bird has the smallest label of its group.
+
+    :param n: number of birds.
+    :type n: int
+    :param group_birds: for every bird, the group mates that are closer than the group boundary distance.
+    :type group_birds: :class:`neighbours.NeighbourList`
+    :return: the label of the group of every bird, with shape (n,).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    labels = np.arange(n)
+    while True:
+        minimum, found = segmentMinimum(labels[group_birds.indices], group_birds.offsets)
+        new_labels = labels.copy()
+        new_labels[found] = np.minimum(labels[found], minimum)
+        # Follow labels to their own label, so that long chains are joined in a few iterations
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+def groups(birds, attraction_points, repulsion_points, config):
+    """
+    Counts the groups of birds (see :func:`groupLabels`).
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: the number of groups and the size of the largest one.
+    :rtype: dict
+
+    |
+    """
+
+    sizes = np.bincount(groupLabels(len(birds), birds.groupMates(config)), minlength=1)
+    return {'groups': int(np.count_nonzero(sizes)), 'largest_group': int(sizes.max())}
+
+
+def pointsDistance(birds, attraction_points, repulsion_points, config):
+    """
+    Computes the average distance from every bird to the closest attraction point and to the closest repulsion point.
+    The distances from the points of a kind to all birds are computed at once, as a matrix.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: the average distances (NaN if there are no points of a kind).
+    :rtype: dict
+
+    |
+    """
+
+    result = {}
+    for name, points in (('attraction_distance', attraction_points), ('repulsion_distance', repulsion_points)):
+        if len(points) == 0 or len(birds) == 0:
+            result[name] = float('nan')
+            continue
+        # Matrix of the vectors from the points to every bird, measured as the engine does (through the boundaries if PERIODIC is set),
+        # in blocks of points so that it stays around a million distances
+        chunk = max(1, 2**20//len(birds))
+        dist_sq = np.full(len(birds), np.inf)
+        for first in range(0, len(points), chunk):
+            dist = neighbours.displacement(points.position[first:first+chunk, None, :], birds.position[None, :, :], config)
+            np.minimum(dist_sq, np.einsum('ijk,ijk->ij', dist, dist).min(axis=0), out=dist_sq)
+        result[name] = float(np.sqrt(dist_sq).mean())
+    return result
+
+
+METRICS = {
+    'polarization': polarization,
+    'nearest_neighbour': nearestNeighbour,
+    'groups': groups,
+    'points_distance': pointsDistance,
+}
+
+
+def compute(birds, attraction_points, repulsion_points, config, names=None):
+    """
+    Computes some metrics of the current state of the simulation.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param names: names of the metrics (see :py:data:`METRICS`), defaults to None (all).
+    :type names: list, optional
+    :return: values of the metrics, by name.
+    :rtype: dict
+
+    |
+    """
+
+    values = {}
+    for name in names or METRICS:
+        values.update(METRICS[name](birds, attraction_points, repulsion_points, config))
+    return values
+
+
+def stage(out=None, every: int = 1, names=None):
+    """
+    Builds a stage that computes metrics while the simulation runs, and writes them as soon as they are computed.
+    The state after every step is sent to it, as ``stage.send((step, birds, attraction_points, repulsion_points, config))``,
+    and it is closed with ``stage.close()``. For example::
+
+        metrics_stage = metrics.stage(sys.stdout, every=10)
+        for step in range(1, n_steps + 1):
+            flock.step(birds, attraction_points, repulsion_points, config)
+            metrics_stage.send((step, birds, attraction_points, repulsion_points, config))
+        metrics_stage.close()
+
+    :param out: file where the metrics are written, as CSV, or as JSON lines if its name ends with ``.jsonl``, defaults to the standard output.
+    :type out: file, optional
+    :param every: number of steps between computations of the metrics, defaults to 1.
+    :type every: int, optional
+    :param names: names of the metrics (see :py:data:`METRICS`), defaults to None (all).
+    :type names: list, optional
+    :return: the stage, already started.
+    :rtype: generator
+    :raises KeyError: if a metric is unknown.
+
+    |
+    """
+
+    for name in names or ():
+        if name not in METRICS:
+            raise KeyError('unknown metric {}'.format(name))
+
+    def run(out):
+        writer = None
+        as_json = getattr(out, 'name', '').endswith('.jsonl')
+        try:
+            while True:
+                step, birds, attraction_points, repulsion_points, config = yield
+                if step % every != 0:
+                    continue
+
+                row = {'step': step, **compute(birds, attraction_points, repulsion_points, config, names)}
+                if as_json:
+                    out.write(json.dumps(row) + '\n')
+                else:
+                    if writer is None:
+                        writer = csv.DictWriter(out, list(row))
+                        writer.writeheader()
+                    writer.writerow(row)
+                out.flush()
+        except GeneratorExit:
+            out.flush()
+
+    generator = run(out or sys.stdout)
+    next(generator)
+    return generator
@@ -0,0 +1,399 @@
+"""
+.. module:: neighbours
+
+Search of neighbours with a uniform grid (cell list) that covers the container.
+"""
+
+import itertools
+
+import numpy as np
+
+
+def displacement(origin, target, config):
+    """
+    Computes the vectors that go from some points to others.
+    If :py:data:`PERIODIC` (see :py:mod:`parameters`) is set, the shortest vector through the boundaries is used.
+
+    :param origin: coordinates of the starting points, with shape (M, DIM).
+    :type origin: numpy.ndarray
+    :param target: coordinates of the ending points, with shape (M, DIM).
+    :type target: numpy.ndarray
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: displacement vectors, with shape (M, DIM).
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    dist = target - origin
+    if config.PERIODIC:
+        dist -= config.LENGTH*np.round(dist/config.LENGTH)
+    return dist
+
+
+def pairDistances(origin, target, config):
+    """
+    Computes the vectors that go from some points to others, and their squared modules.
+    Distances are compared squared, so no square root is needed to classify pairs of neighbours.
+
+    :param origin: coordinates of the starting points, with shape (M, DIM).
+    :type origin: numpy.ndarray
+    :param target: coordinates of the ending points, with shape (M, DIM).
+    :type target: numpy.ndarray
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: displacement vectors (see :func:`displacement`), with shape (M, DIM), and their squared modules, with shape (M,).
+    :rtype: tuple
+
+    |
+    """
+
+    dist = displacement(origin, target, config)
+    return dist, np.einsum('ij,ij->i', dist, dist)
+
+
+class SpatialGrid:
+    """
+    The class that represents a uniform grid of cells that contain birds.
+    It has to be rebuilt each step, after the birds have moved.
+
+    :param position: coordinates of the birds placed in the grid, with shape (N, DIM).
+    :type position: numpy.ndarray
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param cell_size: minimum side of the cells, in pixels, defaults to :py:data:`GROUP_DIST` (see :py:mod:`parameters`).
+    :type cell_size: float, optional
+    :param groups: number of the flock of every bird, when the grid holds several independent flocks, with shape (N,). Defaults to None (one flock).
+    :type groups: numpy.ndarray, optional
+    :param n_groups: number of flocks, when points of flocks without birds in the grid are searched, defaults to the largest number in ``groups`` plus one.
+    :type n_groups: int, optional
+
+    |
+    """
+
+    def __init__(self, position, config, cell_size=None, groups=None, n_groups=None):
+        """
+        Constructor for the grid class. Places every bird in its cell.
+
+        |
+        """
+
+        if cell_size is None:
+            cell_size = config.GROUP_DIST
+
+        self.position = position
+        self.config = config
+        self.lower = config.LOWER
+        self.length = config.LENGTH
+        self.shape = np.maximum(1, (self.length // cell_size).astype(int))
+        self.width = self.length/self.shape
+        self.strides = np.cumprod(np.concatenate([[1], self.shape[:-1]]))
+
+        # Every flock has its own copy of the cells
+        self.n_cells = int(np.prod(self.shape))
+        if n_groups is None:
+            n_groups = 1 if groups is None or len(groups) == 0 else int(groups.max()) + 1
+
+        keys = self.keys(self.cells(position))
+        if groups is not None:
+            keys += groups*self.n_cells
+        self.order = np.argsort(keys, kind='stable')
+        self.start = np.concatenate([[0], np.cumsum(np.bincount(keys, minlength=n_groups*self.n_cells))])
+
+
+    def cells(self, position):
+        """
+        Finds the cell where some points are.
+
+        :param position: coordinates of the points, with shape (M, DIM).
+        :type position: numpy.ndarray
+        :return: coordinates of the cells, with shape (M, DIM).
+        :rtype: numpy.ndarray
+
+        |
+        """
+
+        return np.clip(np.floor((position - self.lower)/self.width).astype(int), 0, self.shape - 1)
+
+
+    def keys(self, cells):
+        """
+        Gives a single number to every cell.
+
+        :param cells: coordinates of the cells, with shape (..., DIM).
+        :type cells: numpy.ndarray
+        :return: numbers of the cells, with shape (...).
+        :rtype: numpy.ndarray
+
+        |
+        """
+
+        return (cells*self.strides).sum(axis=-1)
+
+
+    def offsets(self, radius):
+        """
+        Finds the cells that have to be checked around a cell to find all birds closer than a distance.
+        No cell is repeated, even if the distance is larger than the grid.
+
+        :param radius: the distance, in pixels.
+        :type radius: float
+        :return: offsets between the cells, with shape (M, DIM).
+        :rtype: numpy.ndarray
+
+        |
+        """
+
+        ranges = []
+        for reach, n in zip(np.ceil(radius/self.width).astype(int), self.shape):
+            if not self.config.PERIODIC:
+                reach = min(reach, n - 1)
+                ranges.append(range(-reach, reach + 1))
+            elif 2*reach + 1 <= n:
+                ranges.append(range(-reach, reach + 1))
+            else:
+                ranges.append(range(n))
+
+        return np.array(list(itertools.product(*ranges)), dtype=int).reshape(-1, self.config.DIM)
+
+
+    def query(self, position, radii, exclude_self=False, out=None, groups=None, chunk=1024, first_index=0):
+        """
+        Finds the birds of the grid that are closer than each of the given distances to some points.
+        Pairs of points with a bird at the exact same position are not included.
+
+        :param position: coordinates of the points whose neighbours are searched, with shape (M, DIM).
+        :type position: numpy.ndarray
+        :param radii: distances for which the neighbours are returned.
+        :type radii: tuple
+        :param exclude_self: whether the points are the birds of the grid, so that pairs of a bird with itself are not included, defaults to False.
+        :type exclude_self: bool, optional
+        :param out: lists where the neighbours are stored, one for every distance. New lists are created if not given.
+        :type out: list, optional
+        :param groups: number of the flock of every point, whose neighbours are only searched among the birds of that flock. Required if the grid was built with groups.
+        :type groups: numpy.ndarray, optional
+        :param chunk: number of points searched at once, to bound memory use, defaults to 1024.
+        :type chunk: int, optional
+        :param first_index: index in the grid of the first point, when the points are a range of the birds of the grid (used with ``exclude_self``), defaults to 0.
+        :type first_index: int, optional
+        :return: for every distance, the list of birds of the grid that are closer than the distance to every point, with the vectors that go from the point to them.
+        :rtype: list
+
+        |
+        """
+
+        if out is None:
+            out = [NeighbourList() for radius in radii]
+        for neighbour_list in out:
+            neighbour_list.reset(len(position))
+
+        offsets = self.offsets(max(radii))
+
+        for first in range(0, len(position), chunk):
+            block = position[first:first+chunk]
+
+            neighbour_cells = self.cells(block)[:, None, :] + offsets[None, :, :]
+            if self.config.PERIODIC:
+                neighbour_cells %= self.shape
+                point, cell = np.nonzero(np.ones(neighbour_cells.shape[:2], dtype=bool))
+            else:
+                point, cell = np.nonzero(np.all((neighbour_cells >= 0) & (neighbour_cells < self.shape), axis=2))
+
+            keys = self.keys(neighbour_cells[point, cell])
+            if groups is not None:
+                keys += groups[first + point]*self.n_cells
+            start = self.start[keys]
+            counts = self.start[keys + 1] - start
+
+            point = np.repeat(point, counts)
+            slot = np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            candidate = self.order[slot]
+
+            dist, dist_sq = pairDistances(block[point], self.position[candidate], self.config)
+            valid = (dist_sq > 0) & (dist_sq < max(radii)**2)
+            if exclude_self:
+                valid &= candidate != point + first + first_index
+            point, candidate, dist, dist_sq = point[valid] + first, candidate[valid], dist[valid], dist_sq[valid]
+
+            for neighbour_list, radius in zip(out, radii):
+                close = dist_sq < radius*radius
+                neighbour_list.extend(point[close], candidate[close], dist[close], dist_sq[close])
+
+        for neighbour_list in out:
+            neighbour_list.finish()
+
+        return out
+
+
+class NeighbourList:
+    """
+    The class that stores the neighbours of every bird as compressed rows: the neighbours of bird k are ``indices[offsets[k]:offsets[k+1]]``.
+    The vector from the bird to every neighbour, and its squared module, are kept too, so the rules do not compute them again.
+    Its buffers are reused from one step to the next, and only grow when more room is needed.
+
+    :param capacity: number of pairs of neighbours that fit initially, defaults to 0.
+    :type capacity: int, optional
+
+    |
+    """
+
+    def __init__(self, capacity: int = 0):
+        """
+        Constructor for the neighbour list class.
+
+        |
+        """
+
+        self.offsets = np.zeros(1, dtype=np.intp)
+        self.size = 0
+        self._rows = np.empty(capacity, dtype=np.intp)
+        self._indices = np.empty(capacity, dtype=np.intp)
+        self._displacement = np.empty((capacity, 0))
+        self._dist_sq = np.empty(capacity)
+
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+    def __getitem__(self, k):
+        return self._indices[self.offsets[k]:self.offsets[k+1]]
+
+
+    @property
+    def rows(self):
+        """
+        Index of the bird of every pair of neighbours, sorted.
+
+        |
+        """
+
+        return self._rows[:self.size]
+
+
+    @property
+    def indices(self):
+        """
+        Index of the neighbour of every pair of neighbours.
+
+        |
+        """
+
+        return self._indices[:self.size]
+
+
+    @property
+    def displacement(self):
+        """
+        Vector that goes from the bird to the neighbour, for every pair of neighbours.
+
+        |
+        """
+
+        return self._displacement[:self.size]
+
+
+    @property
+    def dist_sq(self):
+        """
+        Squared distance between the bird and the neighbour, for every pair of neighbours.
+
+        |
+        """
+
+        return self._dist_sq[:self.size]
+
+
+    def counts(self):
+        """
+        Gives the number of neighbours of every bird.
+
+        :return: number of neighbours, with shape (N,).
+        :rtype: numpy.ndarray
+
+        |
+        """
+
+        return np.diff(self.offsets)
+
+
+    def reset(self, n: int):
+        """
+        Empties the list, keeping its buffers.
+
+        :param n: number of birds whose neighbours will be stored.
+        :type n: int
+
+        |
+        """
+
+        if len(self.offsets) != n + 1:
+            self.offsets = np.zeros(n + 1, dtype=np.intp)
+        self.size = 0
+
+
+    def extend(self, i, j, displacement, dist_sq):
+        """
+        Adds pairs of neighbours at the end of the list. Pairs have to be added sorted by bird.
+
+        :param i: index of the bird of every pair.
+        :type i: numpy.ndarray
+        :param j: index of the neighbour of every pair.
+        :type j: numpy.ndarray
+        :param displacement: vector that goes from the bird to the neighbour, for every pair, with shape (M, DIM).
+        :type displacement: numpy.ndarray
+        :param dist_sq: squared module of the vectors.
+        :type dist_sq: numpy.ndarray
+
+        |
+        """
+
+        end = self.size + len(i)
+        if end > len(self._indices) or displacement.shape[1] != self._displacement.shape[1]:
+            capacity = max(end, 2*len(self._indices))
+            self._rows = grow(self._rows, self.size, capacity)
+            self._indices = grow(self._indices, self.size, capacity)
+            self._displacement = grow(self._displacement, self.size, capacity, displacement.shape[1:])
+            self._dist_sq = grow(self._dist_sq, self.size, capacity)
+
+        self._rows[self.size:end] = i
+        self._indices[self.size:end] = j
+        self._displacement[self.size:end] = displacement
+        self._dist_sq[self.size:end] = dist_sq
+        self.size = end
+
+
+    def finish(self):
+        """
+        Computes the offsets of every bird once all pairs have been added.
+
+        |
+        """
+
+        self.offsets[0] = 0
+        np.cumsum(np.bincount(self.rows, minlength=len(self)), out=self.offsets[1:])
+
+
+def grow(buffer, size, capacity, shape=()):
+    """
+    Makes room in a buffer, keeping its content.
+
+    :param buffer: the buffer.
+    :type buffer: numpy.ndarray
+    :param size: number of rows of the buffer that are in use.
+    :type size: int
+    :param capacity: number of rows of the new buffer.
+    :type capacity: int
+    :param shape: shape of every row, defaults to the one of the buffer.
+    :type shape: tuple, optional
+    :return: the new buffer.
+    :rtype: numpy.ndarray
+
+    |
+    """
+
+    new = np.empty((capacity,) + (tuple(shape) or buffer.shape[1:]), dtype=buffer.dtype)
+    if new.shape[1:] == buffer.shape[1:]:
+        new[:size] = buffer[:size]
+    return new
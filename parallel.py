@@ -0,0 +1,262 @@
+"""
+.. module:: parallel
+
+Steps of the simulation run by a pool of threads.
+
+Birds are split in ranges of indices (partitions), and every thread finds the neighbours of the birds of a partition and applies the rules to them.
+All partitions read the state before the step, and the velocity vectors given by the rules are written to a separate buffer,
+so birds are only moved once every partition has been considered (as in :func:`flock.updateBirds`). The result is the same as with a single thread.
+The heavy work is done by NumPy and by the compiled rules (see :py:mod:`kernels`), which release the GIL, so threads run at the same time.
+
+It is used from the command line with ``--workers``, for example::
+
+    python simulation.py --steps 100 --set NUM_BIRDS=100000 --workers 16
+"""
+
+import parameters as param
+import flock
+import profiling
+
+import collections
+import concurrent.futures
+import contextlib
+import os
+
+import numpy as np
+
+
+class Counter:
+    """
+    The class that counts events of one partition, so threads do not share the counters of the profiler (see :class:`profiling.Profiler`).
+
+    |
+    """
+
+    counters = True
+
+    _null = contextlib.nullcontext()
+
+    def __init__(self):
+        """
+        Constructor for the counter class.
+
+        |
+        """
+
+        self.counts = collections.Counter()
+
+
+    def phase(self, name: str):
+        return self._null
+
+
+    def count(self, name: str, value: int = 1):
+        self.counts[name] += value
+
+
+class Partition:
+    """
+    The class that represents a range of birds, with the buffers used to update them.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param start: index of the first bird of the range.
+    :type start: int
+    :param stop: index after the last bird of the range.
+    :type stop: int
+
+    |
+    """
+
+    def __init__(self, birds, start: int, stop: int):
+        """
+        Constructor for the partition class.
+
+        |
+        """
+
+        self.start = start
+        self.stop = stop
+        # Views of the rows of the flock, which are moved in place
+        self.birds = flock.Flock(birds.position[start:stop], birds.direction[start:stop], birds.speed[start:stop], birds.type)
+        self.groups = birds.groups[start:stop] if birds.groups is not None else None
+        self.counter = Counter()
+
+
+class Pool:
+    """
+    The class that runs the steps of a simulation on a pool of threads.
+
+    :param workers: number of threads, defaults to the number of processors.
+    :type workers: int, optional
+    :param partitions: number of ranges in which birds are split, defaults to 4 per thread (so threads that finish earlier take more of them).
+    :type partitions: int, optional
+
+    |
+    """
+
+    def __init__(self, workers: int = None, partitions: int = None):
+        """
+        Constructor for the pool class.
+
+        |
+        """
+
+        self.workers = workers or os.cpu_count() or 1
+        self.n_partitions = partitions or 4*self.workers
+        self.executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix='step')
+
+        self._key = None
+        self._partitions = []
+        self._rules_vel = np.empty((0, 0))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        """
+        Stops the threads, once the steps that are running have finished.
+
+        |
+        """
+
+        self.executor.shutdown()
+
+
+    def partitions(self, birds):
+        """
+        Splits the birds in ranges of the same size. The ranges are kept while the arrays of the birds are the same.
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :return: the ranges of birds, as instances of the class :class:`parallel.Partition`.
+        :rtype: list
+
+        |
+        """
+
+        key = (birds.position, birds.direction, birds.speed, birds.groups)
+        if self._key is None or any(a is not b for a, b in zip(key, self._key)):
+            bounds = np.linspace(0, len(birds), min(self.n_partitions, len(birds)) + 1).astype(int)
+            self._partitions = [Partition(birds, start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+            self._rules_vel = np.empty(birds.position.shape)
+            self._key = key
+        return self._partitions
+
+
+    def map(self, function, partitions):
+        """
+        Runs a function for every partition on the threads, and waits until all of them have finished.
+
+        :param function: function that receives a partition.
+        :type function: function
+        :param partitions: the partitions.
+        :type partitions: list
+
+        |
+        """
+
+        for future in [self.executor.submit(function, partition) for partition in partitions]:
+            future.result()
+
+
+    def updateBirds(self, birds, attraction_points, repulsion_points, config, profiler=profiling.NULL):
+        """
+        Updates direction, speed and position of all birds, as :func:`flock.updateBirds`, with every partition on a thread.
+        The neighbours of every partition are gathered in the lists of the flock afterwards, as they are used by other modules (see :py:mod:`metrics`).
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :param attraction_points: the attraction points of the simulation.
+        :type attraction_points: :class:`flock.Flock`
+        :param repulsion_points: the repulsion points of the simulation.
+        :type repulsion_points: :class:`flock.Flock`
+        :param config: parameters of the simulation.
+        :type config: :class:`parameters.Config`
+        :param profiler: profiler of the phases ``neighbours`` (the grid), ``rules`` (neighbours of every partition and rules) and ``move``, defaults to :py:data:`profiling.NULL`.
+        :type profiler: :class:`profiling.Profiler`, optional
+
+        |
+        """
+
+        position, direction = birds.position, birds.direction
+        partitions = self.partitions(birds)
+        rules_vel = self._rules_vel
+        radii = (config.GROUP_DIST, config.MIN_DIST, min(config.VIEW_DIST, config.GROUP_DIST))
+
+        with profiler.phase('neighbours'):
+            grid = birds.grid(config)
+
+        def rules(partition):
+            start, stop = partition.start, partition.stop
+            group_birds, close_neighbours, view_birds = grid.query(position[start:stop], radii, exclude_self=True, groups=partition.groups,
+                                                                   first_index=start, out=[partition.birds.group_birds, partition.birds.close_neighbours,
+                                                                                     partition.birds.view_birds])
+            rules_vel[start:stop] = flock.rulesVelocity(position[start:stop], direction[start:stop], direction, group_birds, close_neighbours, view_birds,
+                                                        attraction_points, repulsion_points, config, partition.groups,
+                                                        partition.counter if profiler.counters else profiling.NULL)
+
+        def move(partition):
+            partition.birds.update(rules_vel[partition.start:partition.stop], config)
+
+        with profiler.phase('rules'):
+            self.map(rules, partitions)
+
+        # Every partition only reads the state before the step until here
+        with profiler.phase('move'):
+            self.map(move, partitions)
+        birds._grid = None
+
+        with profiler.phase('neighbours'):
+            for name in ('group_birds', 'close_neighbours', 'view_birds'):
+                merged = getattr(birds, name)
+                merged.reset(len(birds))
+                for partition in partitions:
+                    part = getattr(partition.birds, name)
+                    merged.extend(part.rows + partition.start, part.indices, part.displacement, part.dist_sq)
+                merged.finish()
+
+        if profiler.counters:
+            profiler.count('group_birds', birds.group_birds.size)
+            profiler.count('close_birds', birds.close_neighbours.size)
+            profiler.count('view_birds', birds.view_birds.size)
+            for partition in partitions:
+                for name, value in partition.counter.counts.items():
+                    profiler.count(name, value)
+                partition.counter.counts.clear()
+
+
+    def step(self, birds, attraction_points, repulsion_points, config=None, profiler=profiling.NULL):
+        """
+        Advances the simulation one step, as :func:`flock.step`, updating the birds on the threads.
+        If :py:data:`SYNCHRONOUS` is not set (see :py:mod:`parameters`), birds are updated one after another, on a single thread.
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :param attraction_points: the attraction points of the simulation.
+        :type attraction_points: :class:`flock.Flock`
+        :param repulsion_points: the repulsion points of the simulation.
+        :type repulsion_points: :class:`flock.Flock`
+        :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+        :type config: :class:`parameters.Config`, optional
+        :param profiler: profiler of the phases of the step (see :meth:`updateBirds`, plus ``points``), defaults to :py:data:`profiling.NULL` (not measured).
+        :type profiler: :class:`profiling.Profiler`, optional
+
+        |
+        """
+
+        if config is None:
+            config = param.Config()
+
+        if config.SYNCHRONOUS:
+            self.updateBirds(birds, attraction_points, repulsion_points, config, profiler)
+        else:
+            flock.updateBirdsSequential(birds, attraction_points, repulsion_points, config, profiler)
+        with profiler.phase('points'):
+            flock.updatePoints(attraction_points, repulsion_points, birds, config)
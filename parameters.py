@@ -71,6 +71,15 @@ Parameters used while running the simulation.
 
     (`float`) angle that determines the vision area of a bird, in radians.
 
+.. data:: PERIODIC: 
+
+    (`bool`) whether birds also see neighbours through the boundaries of the container (as they reappear on the other side when they cross them).
+
+.. data:: SYNCHRONOUS: 
+
+    (`bool`) whether all birds are updated at once from the state of the previous step, so results do not depend on their order.
+    Otherwise they are updated one after another, as in the first versions of the simulation, and every bird sees the birds before it already moved.
+
 |
 
 .. data:: MIN_DIST_ATTRACTOR: 
@@ -85,6 +94,15 @@ Parameters used while running the simulation.
 
     (`int`) distance that determines which birds are withing the group boundary of the repulsion point (so it will try to go towards the center of that group), in pixels.
 
+.. data:: ATTRACTION_DIST:  
+
+    (`int`) distance within which birds go towards the attraction points, in pixels. Farther points are not considered, so a bird only goes to the ones around it,
+    which are found with a grid (see :func:`flock.pointsCenterWithin`). If it is 0, every bird goes towards the center of all the attraction points.
+
+.. data:: REPULSION_DIST:  
+
+    (`int`) distance within which birds go away from the repulsion points, in pixels. If it is 0, every bird goes away from the center of all the repulsion points.
+
 |
 
 .. data:: WIDTH: 
@@ -159,8 +177,11 @@ Parameters used while running the simulation.
 """
 
 
+import contextlib
 import math
 
+import numpy as np
+
 
 DIM = 3
 
@@ -192,10 +213,14 @@ MIN_DIST = 30
 GROUP_DIST = 200
 VIEW_DIST = 50
 VIEW_ANGLE = math.pi/4
+PERIODIC = False
+SYNCHRONOUS = True
 
 MIN_DIST_ATTRACTOR = 100
 MIN_DIST_REPULSOR = 100
 GROUP_DIST_REPULSOR = 2000
+ATTRACTION_DIST = 0
+REPULSION_DIST = 0
 
 MIN_VEL = 20
 MAX_VEL = 40
@@ -207,3 +232,139 @@ DELTA = 0.00001
 FPS = 30
 
 ROTATION = 10
+
+
+NAMES = ('DIM', 'NUM_BIRDS', 'ATTRACTION_POINTS', 'REPULSION_POINTS',
+         'W_AVOIDANCE', 'W_CENTER', 'W_COPY', 'W_VIEW', 'W_ATTRACTION', 'W_REPULSION', 'MU',
+         'WIDTH', 'HEIGHT', 'X_MIN', 'X_MAX', 'Y_MIN', 'Y_MAX', 'Z_MIN', 'Z_MAX',
+         'MIN_DIST', 'GROUP_DIST', 'VIEW_DIST', 'VIEW_ANGLE', 'PERIODIC', 'SYNCHRONOUS',
+         'MIN_DIST_ATTRACTOR', 'MIN_DIST_REPULSOR', 'GROUP_DIST_REPULSOR', 'ATTRACTION_DIST', 'REPULSION_DIST',
+         'MIN_VEL', 'MAX_VEL', 'BOUNDARY_DELTA', 'TIME_DELTA', 'DELTA', 'FPS', 'ROTATION')
+
+
+class Config:
+    """
+    Immutable set of values of the parameters above, used by the simulation engine (see :py:mod:`flock`).
+    Several configurations can be used at the same time in one process.
+
+    Besides the parameters, it has some constants derived from them:
+    ``MIN_DIST_SQ``, ``GROUP_DIST_SQ`` and ``VIEW_DIST_SQ`` (squared distances), ``COS_VIEW_ANGLE`` (cosine of :py:data:`VIEW_ANGLE`),
+    and ``LOWER``, ``UPPER`` and ``LENGTH`` (limits and size, for every coordinate, of the region where birds can be, as given by the boundary conditions).
+
+    :param values: values of the parameters, by name. The ones not given are taken from this module.
+    :type values: dict
+    :raises ValueError: if a parameter is unknown or the values are not consistent.
+
+    |
+    """
+
+    __slots__ = NAMES + ('MIN_DIST_SQ', 'GROUP_DIST_SQ', 'VIEW_DIST_SQ', 'COS_VIEW_ANGLE', 'LOWER', 'UPPER', 'LENGTH')
+
+    def __init__(self, **values):
+        """
+        Constructor for the configuration class.
+
+        |
+        """
+
+        for name in values:
+            if name not in NAMES:
+                raise ValueError('unknown parameter {}'.format(name))
+
+        module = globals()
+        for name in NAMES:
+            object.__setattr__(self, name, values.get(name, module[name]))
+
+        if self.DIM not in (2, 3):
+            raise ValueError('DIM has to be 2 or 3, not {}'.format(self.DIM))
+        for point in list(self.ATTRACTION_POINTS) + list(self.REPULSION_POINTS):
+            if len(point) != self.DIM:
+                raise ValueError('point {} does not have {} coordinates'.format(point, self.DIM))
+        for name in ('ATTRACTION_DIST', 'REPULSION_DIST'):
+            if getattr(self, name) < 0:
+                raise ValueError('{} cannot be negative'.format(name))
+
+        lower = np.array([self.X_MIN + self.BOUNDARY_DELTA, self.Y_MIN + self.BOUNDARY_DELTA, self.Z_MIN - self.BOUNDARY_DELTA][:self.DIM], dtype=float)
+        upper = np.array([self.X_MAX - self.BOUNDARY_DELTA, self.Y_MAX - self.BOUNDARY_DELTA, self.Z_MAX + self.BOUNDARY_DELTA][:self.DIM], dtype=float)
+        length = upper - lower
+        for array in (lower, upper, length):
+            array.flags.writeable = False
+
+        object.__setattr__(self, 'MIN_DIST_SQ', self.MIN_DIST**2)
+        object.__setattr__(self, 'GROUP_DIST_SQ', self.GROUP_DIST**2)
+        object.__setattr__(self, 'VIEW_DIST_SQ', self.VIEW_DIST**2)
+        object.__setattr__(self, 'COS_VIEW_ANGLE', math.cos(self.VIEW_ANGLE))
+        object.__setattr__(self, 'LOWER', lower)
+        object.__setattr__(self, 'UPPER', upper)
+        object.__setattr__(self, 'LENGTH', length)
+
+
+    def __setattr__(self, name, value):
+        raise AttributeError('configurations are immutable, use replace() to change {}'.format(name))
+
+
+    def __repr__(self):
+        return 'Config({})'.format(', '.join('{}={!r}'.format(name, getattr(self, name)) for name in NAMES))
+
+
+    def __reduce__(self):
+        return (_fromValues, (self.values(),))
+
+
+    def values(self):
+        """
+        Gives the values of the parameters.
+
+        :return: values of the parameters, by name.
+        :rtype: dict
+
+        |
+        """
+
+        return {name: getattr(self, name) for name in NAMES}
+
+
+    def replace(self, **values):
+        """
+        Builds a configuration that only differs from this one in some parameters.
+
+        :param values: new values of the parameters, by name.
+        :type values: dict
+        :return: the new configuration.
+        :rtype: :class:`parameters.Config`
+
+        |
+        """
+
+        return Config(**{**self.values(), **values})
+
+
+def _fromValues(values):
+    return Config(**values)
+
+
+@contextlib.contextmanager
+def use(config):
+    """
+    Sets the values of a configuration as the parameters of this module while a block runs, and restores the previous ones afterwards.
+    It is used to run the methods of :class:`bird.Bird`, which read the parameters of this module, with a given configuration. For example::
+
+        with parameters.use(parameters.Config(DIM=2, ATTRACTION_POINTS=[(0, 0)], REPULSION_POINTS=[])):
+            vel = bird.view(group_birds)
+
+    The parameters are replaced for every thread of the process, so it is not thread-safe:
+    it must not be used while other threads run the simulation or use another configuration.
+
+    :param config: the configuration.
+    :type config: :class:`parameters.Config`
+
+    |
+    """
+
+    module = globals()
+    previous = {name: module[name] for name in NAMES}
+    module.update(config.values())
+    try:
+        yield config
+    finally:
+        module.update(previous)
@@ -0,0 +1,198 @@
+"""
+.. module:: profiling
+
+Instrumentation of the simulation: how long every phase of a frame takes, and how many times some things happen in it
+(for example, how many neighbours are visited or how many birds see another one in their area of view).
+
+Profiling is off by default: the engine (see :py:mod:`flock`) uses :py:data:`NULL`, whose methods do nothing.
+A :class:`Profiler` keeps the values of the last frames, and gives their percentiles.
+"""
+
+import collections
+import contextlib
+import csv
+import json
+import time
+
+import numpy as np
+
+
+PERCENTILES = (50, 90, 99)
+
+
+class Profiler:
+    """
+    The class that measures the phases of every frame and counts events in them.
+    The values of the last frames are kept, so percentiles are computed over a rolling window.
+
+    :param window: number of frames that are kept, defaults to 300.
+    :type window: int, optional
+    :param counters: whether events are counted (which needs some extra computations in the engine), defaults to True.
+    :type counters: bool, optional
+
+    |
+    """
+
+    enabled = True
+
+    def __init__(self, window: int = 300, counters: bool = True):
+        """
+        Constructor for the profiler class.
+
+        |
+        """
+
+        self.window = window
+        self.counters = counters
+        self.frames = 0
+
+        self.times = {}
+        self.counts = {}
+        self._frame_times = collections.defaultdict(float)
+        self._frame_counts = collections.defaultdict(int)
+        self._frame_start = time.perf_counter()
+
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Measures how long a block of code takes, as part of a phase of the frame. For example::
+
+            with profiler.phase('draw'):
+                renderer.draw(birds, attraction_points, repulsion_points)
+
+        :param name: name of the phase. A phase can be measured several times in a frame, and the times are added up.
+        :type name: str
+
+        |
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._frame_times[name] += time.perf_counter() - start
+
+
+    def count(self, name: str, value: int = 1):
+        """
+        Counts events in the current frame.
+
+        :param name: name of the counter.
+        :type name: str
+        :param value: number of events, defaults to 1.
+        :type value: int, optional
+
+        |
+        """
+
+        self._frame_counts[name] += value
+
+
+    def endFrame(self):
+        """
+        Ends the current frame: keeps its phase times (and the time of the whole frame, as phase ``frame``) and its counters.
+
+        |
+        """
+
+        now = time.perf_counter()
+        self._frame_times['frame'] = now - self._frame_start
+        self._frame_start = now
+
+        for values, frame_values in ((self.times, self._frame_times), (self.counts, self._frame_counts)):
+            for name, value in frame_values.items():
+                if name not in values:
+                    values[name] = collections.deque(maxlen=self.window)
+                values[name].append(value)
+            frame_values.clear()
+
+        self.frames += 1
+
+
+    def summary(self):
+        """
+        Summarizes the frames that are kept.
+
+        :return: for every phase (times in seconds) and counter, by name: number of frames where it appeared, mean, percentiles (see :py:data:`PERCENTILES`) and maximum.
+        :rtype: dict
+
+        |
+        """
+
+        result = {}
+        for kind, values in (('phase', self.times), ('counter', self.counts)):
+            for name, window in values.items():
+                window = np.fromiter(window, dtype=float, count=len(window))
+                percentiles = np.percentile(window, PERCENTILES)
+                result[name] = {'kind': kind, 'frames': len(window), 'mean': float(window.mean()),
+                                **{'p{}'.format(q): float(value) for q, value in zip(PERCENTILES, percentiles)},
+                                'max': float(window.max())}
+        return result
+
+
+    def lines(self):
+        """
+        Writes the summary as short lines of text, to be shown on the screen: the median and 99th percentile of every phase (in milliseconds) and the median of every counter.
+
+        :return: lines of text.
+        :rtype: list
+
+        |
+        """
+
+        lines = []
+        for name, values in self.summary().items():
+            if values['kind'] == 'phase':
+                lines.append('{:<12} {:7.2f} ms  p99 {:7.2f} ms'.format(name, 1000*values['p50'], 1000*values['p99']))
+            else:
+                lines.append('{:<12} {:10.0f}'.format(name, values['p50']))
+        return lines
+
+
+    def write(self, path: str):
+        """
+        Writes the summary to a file, as JSON if its name ends with ``.json`` and as CSV otherwise.
+
+        :param path: path of the file.
+        :type path: str
+
+        |
+        """
+
+        summary = self.summary()
+        with open(path, 'w', newline='') as file:
+            if path.endswith('.json'):
+                json.dump({'frames': self.frames, 'window': self.window, 'summary': summary}, file, indent=2)
+                file.write('\n')
+            else:
+                fields = ['name', 'kind', 'frames', 'mean'] + ['p{}'.format(q) for q in PERCENTILES] + ['max']
+                writer = csv.DictWriter(file, fields)
+                writer.writeheader()
+                for name, values in summary.items():
+                    writer.writerow({'name': name, **values})
+
+
+class NullProfiler:
+    """
+    The class of a profiler that does not measure anything, used when profiling is off.
+
+    |
+    """
+
+    enabled = False
+    counters = False
+
+    _null = contextlib.nullcontext()
+
+    def phase(self, name: str):
+        return self._null
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def endFrame(self):
+        pass
+
+
+NULL = NullProfiler()
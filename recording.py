@@ -0,0 +1,195 @@
+"""
+.. module:: recording
+
+Recording of simulations to a binary file, and replay of the recorded frames.
+
+A recording starts with a fixed-size header, followed by the frames, one after the other.
+Every frame stores, as float32 values, the positions, directions and speeds of the birds, then of the attraction points and then of the repulsion points.
+Frames are only appended, so a recording that is still being written can already be replayed.
+"""
+
+import flock
+
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b'BIRDREC1'
+HEADER = struct.Struct('<8sIIQQQ')
+HEADER_SIZE = 64
+
+
+def frameLayout(dim: int, counts: tuple):
+    """
+    Computes where the state of every kind of object is stored in a frame.
+
+    :param dim: dimension of the simulation.
+    :type dim: int
+    :param counts: number of birds, of attraction points and of repulsion points.
+    :type counts: tuple
+    :return: for every kind of object, the first value of the positions, directions and speeds in the frame; and the number of values of a frame.
+    :rtype: tuple
+
+    |
+    """
+
+    layout = []
+    start = 0
+    for n in counts:
+        layout.append((start, start + n*dim, start + 2*n*dim))
+        start += n*(2*dim + 1)
+    return layout, start
+
+
+class Recorder:
+    """
+    The class that writes the frames of a simulation to a file.
+    Frames are kept in memory and written in chunks.
+
+    :param path: path of the file, which is overwritten.
+    :type path: str
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param chunk: number of frames written at once, defaults to 64.
+    :type chunk: int, optional
+
+    |
+    """
+
+    def __init__(self, path: str, birds, attraction_points, repulsion_points, chunk: int = 64):
+        """
+        Constructor for the recorder class. Writes the header of the file.
+
+        |
+        """
+
+        self.dim = birds.position.shape[1]
+        self.counts = (len(birds), len(attraction_points), len(repulsion_points))
+        self.layout, frame_size = frameLayout(self.dim, self.counts)
+
+        self.buffer = np.empty((chunk, frame_size), dtype=np.float32)
+        self.buffered = 0
+
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, 1, self.dim, *self.counts).ljust(HEADER_SIZE, b'\0'))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def record(self, birds, attraction_points, repulsion_points):
+        """
+        Adds a frame with the current state of the simulation.
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :param attraction_points: the attraction points of the simulation.
+        :type attraction_points: :class:`flock.Flock`
+        :param repulsion_points: the repulsion points of the simulation.
+        :type repulsion_points: :class:`flock.Flock`
+
+        |
+        """
+
+        frame = self.buffer[self.buffered]
+        for points, (position, direction, speed) in zip((birds, attraction_points, repulsion_points), self.layout):
+            frame[position:direction] = points.position.ravel()
+            frame[direction:speed] = points.direction.ravel()
+            frame[speed:speed + len(points)] = points.speed
+
+        self.buffered += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+
+    def flush(self):
+        """
+        Writes the frames kept in memory to the file.
+
+        |
+        """
+
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.file.flush()
+        self.buffered = 0
+
+
+    def close(self):
+        """
+        Writes the remaining frames and closes the file.
+
+        |
+        """
+
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class Replay:
+    """
+    The class that reads the frames of a recording, mapping the file to memory instead of loading it.
+
+    :param path: path of the recording.
+    :type path: str
+    :raises ValueError: if the file is not a recording.
+
+    |
+    """
+
+    def __init__(self, path: str):
+        """
+        Constructor for the replay class. Reads the header of the file and maps the frames.
+        A recording without any complete frame gives a replay without frames.
+
+        |
+        """
+
+        with open(path, 'rb') as file:
+            magic, version, self.dim, *counts = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError('{} is not a recording'.format(path))
+
+        self.counts = tuple(counts)
+        self.layout, frame_size = frameLayout(self.dim, self.counts)
+
+        # Ignore the last frame if it is being written
+        n_frames = (os.path.getsize(path) - HEADER_SIZE)//(4*frame_size) if frame_size else 0
+        if n_frames <= 0:
+            # A region of length zero cannot be mapped
+            self.frames = np.empty((0, frame_size), dtype=np.float32)
+        else:
+            self.frames = np.memmap(path, dtype=np.float32, mode='r', offset=HEADER_SIZE, shape=(n_frames, frame_size))
+
+
+    def __len__(self):
+        return len(self.frames)
+
+
+    def frame(self, k: int):
+        """
+        Gives the state of the simulation in a frame.
+
+        :param k: number of the frame.
+        :type k: int
+        :return: the birds, the attraction points and the repulsion points, as instances of the class :class:`flock.Flock`.
+        :rtype: tuple
+
+        |
+        """
+
+        frame = self.frames[k]
+        return tuple(flock.Flock(frame[position:direction].reshape(n, self.dim), frame[direction:speed].reshape(n, self.dim),
+                                 frame[speed:speed + n], type)
+                     for n, (position, direction, speed), type in zip(self.counts, self.layout, (1, -1, -2)))
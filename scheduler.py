@@ -0,0 +1,221 @@
+"""
+.. module:: scheduler
+
+Scheduling of the steps of the simulation apart from the frames that are shown.
+
+Every step advances the simulation the same interval of time (:py:data:`parameters.TIME_DELTA`),
+and steps are run at a fixed rate of real time, however long drawing a frame takes.
+Frames show the state of the simulation interpolated between the last two steps.
+If the simulation falls behind (its steps take longer than the rate allows), the time it cannot catch up with is dropped,
+so the simulation slows down instead of freezing the window.
+
+Steps can also run on their own thread, while the main thread (which owns the OpenGL context) only draws.
+"""
+
+import flock
+import profiling
+
+import threading
+import time
+
+import numpy as np
+
+
+class Scheduler:
+    """
+    The class that runs the steps of a simulation at a fixed rate.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param attraction_points: the attraction points of the simulation.
+    :type attraction_points: :class:`flock.Flock`
+    :param repulsion_points: the repulsion points of the simulation.
+    :type repulsion_points: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param substeps: number of steps per frame, at :py:data:`parameters.FPS` frames per second, defaults to 1.
+    :type substeps: int, optional
+    :param max_steps: highest number of steps run to catch up at once (the rest of the time is dropped), defaults to 4 times the substeps.
+    :type max_steps: int, optional
+    :param on_step: function called with the birds, the attraction points and the repulsion points after every step, defaults to None.
+    :type on_step: function, optional
+    :param profiler: profiler of the phases of the steps, defaults to :py:data:`profiling.NULL` (not measured).
+    :type profiler: :class:`profiling.Profiler`, optional
+    :param pool: pool of threads that runs every step, defaults to None (steps run on a single thread).
+    :type pool: :class:`parallel.Pool`, optional
+
+    |
+    """
+
+    def __init__(self, birds, attraction_points, repulsion_points, config, substeps: int = 1, max_steps: int = None,
+                 on_step=None, profiler=profiling.NULL, pool=None):
+        """
+        Constructor for the scheduler class.
+
+        |
+        """
+
+        self.config = config
+        self.substeps = substeps
+        self.period = 1/(config.FPS*substeps)
+        self.max_steps = max_steps or 4*substeps
+        self.on_step = on_step
+        self.profiler = profiler
+        self.pool = pool
+
+        self.steps = 0
+        self.dropped = 0
+        self.accumulator = 0.0
+
+        self.lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+        self.reset(birds, attraction_points, repulsion_points)
+
+
+    def reset(self, birds, attraction_points, repulsion_points):
+        """
+        Replaces the state of the simulation.
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :param attraction_points: the attraction points of the simulation.
+        :type attraction_points: :class:`flock.Flock`
+        :param repulsion_points: the repulsion points of the simulation.
+        :type repulsion_points: :class:`flock.Flock`
+
+        |
+        """
+
+        with self.lock:
+            self.birds = birds
+            self.attraction_points = attraction_points
+            self.repulsion_points = repulsion_points
+            self._publish(None, time.perf_counter())
+
+
+    def _publish(self, previous, now):
+        # Copies are shown, so frames never see a step half done
+        current = tuple((points.position.copy(), points.direction.copy())
+                        for points in (self.birds, self.attraction_points, self.repulsion_points))
+        self._snapshot = (previous or current, current, now)
+
+
+    def step(self):
+        """
+        Runs one step of the simulation (see :func:`flock.step`).
+
+        |
+        """
+
+        with self.lock:
+            previous = self._snapshot[1]
+            if self.pool is not None:
+                self.pool.step(self.birds, self.attraction_points, self.repulsion_points, self.config, self.profiler)
+            else:
+                flock.step(self.birds, self.attraction_points, self.repulsion_points, self.config, self.profiler)
+            if self.on_step is not None:
+                self.on_step(self.birds, self.attraction_points, self.repulsion_points)
+            self.steps += 1
+            self._publish(previous, time.perf_counter())
+
+
+    def advance(self, elapsed: float):
+        """
+        Runs the steps that correspond to an interval of real time.
+
+        :param elapsed: real time since the last call, in seconds.
+        :type elapsed: float
+        :return: number of steps that were run.
+        :rtype: int
+
+        |
+        """
+
+        self.accumulator += elapsed
+        n_steps = int(self.accumulator/self.period)
+        if n_steps > self.max_steps:
+            # Falling behind: drop the time that cannot be caught up with
+            self.dropped += n_steps - self.max_steps
+            self.accumulator -= (n_steps - self.max_steps)*self.period
+            n_steps = self.max_steps
+
+        for i in range(n_steps):
+            self.step()
+        self.accumulator -= n_steps*self.period
+        return n_steps
+
+
+    @property
+    def alpha(self):
+        """
+        Fraction of a step that has passed since the last step, used to interpolate between the last two steps.
+
+        |
+        """
+
+        if self._thread is not None:
+            return min((time.perf_counter() - self._snapshot[2])/self.period, 1.0)
+        return min(self.accumulator/self.period, 1.0)
+
+
+    def state(self, interpolate: bool = True):
+        """
+        Gives the state of the simulation to be shown in a frame.
+
+        :param interpolate: whether positions and directions are interpolated between the last two steps, defaults to True (otherwise, the last step is given).
+        :type interpolate: bool, optional
+        :return: the birds, the attraction points and the repulsion points, as instances of the class :class:`flock.Flock` (without speed).
+        :rtype: tuple
+
+        |
+        """
+
+        previous, current, _ = self._snapshot
+        alpha = self.alpha if interpolate else 1.0
+
+        state = []
+        for (previous_position, previous_direction), (position, direction), type in zip(previous, current, (1, -1, -2)):
+            if alpha < 1.0 and len(previous_position) == len(position):
+                # Birds that crossed a boundary in the last step are not interpolated
+                jump = np.abs(position - previous_position) > self.config.LENGTH/2
+                position = np.where(jump, position, previous_position + alpha*(position - previous_position))
+                direction = previous_direction + alpha*(direction - previous_direction)
+                direction = direction/np.maximum(flock.norm(direction), self.config.DELTA)[:, None]
+            state.append(flock.Flock(position, direction, np.zeros(len(position)), type))
+        return tuple(state)
+
+
+    def start(self):
+        """
+        Starts running the steps on their own thread, at the fixed rate.
+
+        |
+        """
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='simulation', daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        """
+        Stops the thread that runs the steps, after its current step.
+
+        |
+        """
+
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+    def _run(self):
+        last = time.perf_counter()
+        while self._running:
+            now = time.perf_counter()
+            self.advance(now - last)
+            last = now
+            time.sleep(max(self.period - self.accumulator, 0))
@@ -0,0 +1,379 @@
+"""
+.. module:: shared
+
+Shared memory between the process that runs the simulation and the process that draws it, so frames are handed over without copying them.
+
+The state of the simulation (positions, directions and speeds of the birds, the attraction points and the repulsion points) is written to a ring of slots
+in a block of shared memory (see :py:mod:`multiprocessing.shared_memory`), with the same layout as a frame of a recording (see :func:`recording.frameLayout`).
+Every slot has a sequence number, which is odd while the slot is being written, so the reader never takes a frame that is half written,
+and the number of the last complete frame is kept in the header. The reader either uses the arrays of the slot directly, as instances of :class:`flock.Flock`
+(see :meth:`FrameBuffer.latest`), or copies the slot into a buffer of its own (see :meth:`FrameBuffer.read`). In both cases it checks that the slot
+was not written again in the meantime, as the simulation may go round the ring while a frame is being used. The window builds its vertices
+from the arrays of the slot, and builds them again from the last frame if the slot was written while they were built (see :func:`main.main`).
+
+The simulation runs in its own process with :class:`SimulationProcess`, for example with ``python main.py --process``.
+"""
+
+import parameters as param
+import simulation
+import scheduler
+import parallel
+import recording
+import flock
+
+import multiprocessing
+from multiprocessing import shared_memory
+import time
+
+import numpy as np
+
+
+MAGIC = int.from_bytes(b'BIRDSHM1', 'little')
+FIELDS = ('magic', 'dim', 'birds', 'attraction_points', 'repulsion_points', 'type_birds', 'type_attraction_points', 'type_repulsion_points',
+          'slots', 'latest')
+ALIGNMENT = 64
+RETRIES = 100
+
+
+class FrameBuffer:
+    """
+    The class that represents a ring of frames in shared memory. It is created by one process (see :meth:`create`) and opened by the others by its name.
+
+    :param name: name of the shared memory block.
+    :type name: str
+    :raises ValueError: if the block does not hold frames.
+
+    |
+    """
+
+    def __init__(self, name: str):
+        """
+        Constructor for the frame buffer class. Opens the shared memory block.
+
+        |
+        """
+
+        self.memory = shared_memory.SharedMemory(name)
+        self.name = self.memory.name
+
+        fields = np.ndarray((len(FIELDS),), dtype=np.int64, buffer=self.memory.buf)
+        if fields[0] != MAGIC:
+            raise ValueError('{} does not hold frames'.format(name))
+        values = dict(zip(FIELDS, fields.tolist()))
+
+        self.dim = values['dim']
+        self.counts = (values['birds'], values['attraction_points'], values['repulsion_points'])
+        self.types = (values['type_birds'], values['type_attraction_points'], values['type_repulsion_points'])
+        self.slots = values['slots']
+        self.layout, frame_size = recording.frameLayout(self.dim, self.counts)
+
+        self.header = np.ndarray((len(FIELDS) + self.slots,), dtype=np.int64, buffer=self.memory.buf)
+        self.sequence = self.header[len(FIELDS):]
+        self.frames = np.ndarray((self.slots, frame_size), dtype=np.float64, buffer=self.memory.buf, offset=headerSize(self.slots))
+        self.written = int(self.header[FIELDS.index('latest')])
+        self._copy = None
+
+
+    @classmethod
+    def create(cls, dim: int, counts: tuple, types: tuple = (1, -1, -2), slots: int = 3):
+        """
+        Creates a ring of frames in shared memory, with room for the state of a simulation.
+
+        :param dim: dimension of the simulation.
+        :type dim: int
+        :param counts: number of birds, attraction points and repulsion points.
+        :type counts: tuple
+        :param types: types of the birds, the attraction points and the repulsion points (see :class:`bird.Bird`), defaults to (1, -1, -2).
+        :type types: tuple, optional
+        :param slots: number of frames in the ring, defaults to 3 (one being written, the last complete one and the one before it, which may still be read).
+        :type slots: int, optional
+        :return: the frame buffer.
+        :rtype: :class:`shared.FrameBuffer`
+
+        |
+        """
+
+        frame_size = recording.frameLayout(dim, counts)[1]
+
+        memory = shared_memory.SharedMemory(create=True, size=headerSize(slots) + max(slots*frame_size*8, 8))
+        header = np.ndarray((len(FIELDS) + slots,), dtype=np.int64, buffer=memory.buf)
+        header[:] = 0
+        header[:len(FIELDS) - 1] = (MAGIC, dim, *counts, *types, slots)
+        del header
+
+        frames = cls(memory.name)
+        memory.close()
+        return frames
+
+
+    def write(self, birds, attraction_points, repulsion_points):
+        """
+        Writes a frame with the current state of the simulation, in the slot after the last one.
+
+        :param birds: the birds of the simulation.
+        :type birds: :class:`flock.Flock`
+        :param attraction_points: the attraction points of the simulation.
+        :type attraction_points: :class:`flock.Flock`
+        :param repulsion_points: the repulsion points of the simulation.
+        :type repulsion_points: :class:`flock.Flock`
+
+        |
+        """
+
+        number = self.written + 1
+        slot = number % self.slots
+
+        # Odd while it is being written
+        self.sequence[slot] = 2*number - 1
+        frame = self.frames[slot]
+        for points, (position, direction, speed) in zip((birds, attraction_points, repulsion_points), self.layout):
+            frame[position:direction] = points.position.ravel()
+            frame[direction:speed] = points.direction.ravel()
+            frame[speed:speed + len(points)] = points.speed
+        self.sequence[slot] = 2*number
+
+        self.header[FIELDS.index('latest')] = number
+        self.written = number
+
+
+    def latest(self):
+        """
+        Gives the last complete frame. Its arrays are the ones in shared memory, so they are only valid until the slot is written again
+        (which can be checked with :meth:`valid`). Use :meth:`read` to get a copy that cannot change.
+
+        :return: the number of the frame and the birds, the attraction points and the repulsion points, as instances of the class :class:`flock.Flock`; or None and None if no frame has been written yet, or if the writer went round the ring :py:data:`RETRIES` times while it was being found.
+        :rtype: tuple
+
+        |
+        """
+
+        for attempt in range(RETRIES):
+            number = int(self.header[FIELDS.index('latest')])
+            if number == 0:
+                return None, None
+            if self.valid(number):
+                return number, self._state(self.frames[number % self.slots])
+            # The writer has gone round the ring in the meantime, so it is given time to finish the frame
+            time.sleep(0)
+        return None, None
+
+
+    def read(self):
+        """
+        Gives a copy of the last complete frame. The slot is copied into a buffer, which is reused by every call,
+        and the copy is only kept if the slot was not written again while it was copied; otherwise, the last frame is copied again.
+
+        :return: the number of the frame and the birds, the attraction points and the repulsion points, as instances of the class :class:`flock.Flock` (valid until the next call); or None and None if no frame has been written yet, or if no copy was complete after :py:data:`RETRIES` attempts.
+        :rtype: tuple
+
+        |
+        """
+
+        if self._copy is None:
+            self._copy = np.empty(self.frames.shape[1])
+
+        for attempt in range(RETRIES):
+            number = int(self.header[FIELDS.index('latest')])
+            if number == 0:
+                return None, None
+            if self.valid(number):
+                np.copyto(self._copy, self.frames[number % self.slots])
+                if self.valid(number):
+                    return number, self._state(self._copy)
+            time.sleep(0)
+        return None, None
+
+
+    def _state(self, frame):
+        # Flocks whose arrays are parts of a frame
+        return tuple(flock.Flock(frame[position:direction].reshape(n, self.dim), frame[direction:speed].reshape(n, self.dim),
+                                 frame[speed:speed + n], type)
+                     for n, (position, direction, speed), type in zip(self.counts, self.layout, self.types))
+
+
+    def valid(self, number: int):
+        """
+        Checks whether a frame is still in its slot, so the arrays given by :meth:`latest` were not changed while they were used.
+
+        :param number: number of the frame.
+        :type number: int
+        :return: whether the frame has not been overwritten.
+        :rtype: bool
+
+        |
+        """
+
+        return bool(self.sequence[number % self.slots] == 2*number)
+
+
+    def close(self):
+        """
+        Closes the shared memory block in this process. Arrays given by :meth:`latest` cannot be used afterwards.
+
+        |
+        """
+
+        self.header = self.sequence = self.frames = None
+        self.memory.close()
+
+
+    def unlink(self):
+        """
+        Removes the shared memory block, once every process has closed it. Only the process that created it should call it.
+
+        |
+        """
+
+        self.memory.unlink()
+
+
+def headerSize(slots: int):
+    """
+    Gives the size of the header of a frame buffer: its fields and the sequence number of every slot, aligned to :py:data:`ALIGNMENT` bytes.
+
+    :param slots: number of frames in the ring.
+    :type slots: int
+    :return: size, in bytes.
+    :rtype: int
+
+    |
+    """
+
+    return -(-8*(len(FIELDS) + slots)//ALIGNMENT)*ALIGNMENT
+
+
+def run(name: str, config, seed, substeps: int, workers: int, control):
+    """
+    Runs the simulation at a fixed rate (see :class:`scheduler.Scheduler`), writing every step to a frame buffer, until it is told to stop.
+
+    :param name: name of the frame buffer.
+    :type name: str
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param seed: seed used to generate the initial state, or None.
+    :type seed: int
+    :param substeps: number of steps per frame.
+    :type substeps: int
+    :param workers: number of threads that run every step (see :py:mod:`parallel`).
+    :type workers: int
+    :param control: connection to the process that draws, which sends ``'reset'`` and ``'close'``.
+    :type control: multiprocessing.connection.Connection
+
+    |
+    """
+
+    frames = FrameBuffer(name)
+    birds, attraction_points, repulsion_points = simulation.initialize(config, seed)
+    frames.write(birds, attraction_points, repulsion_points)
+
+    pool = parallel.Pool(workers) if workers > 1 else None
+    schedule = scheduler.Scheduler(birds, attraction_points, repulsion_points, config, substeps, on_step=frames.write, pool=pool)
+    schedule.start()
+
+    while True:
+        order = control.recv()
+        if order == 'reset':
+            schedule.reset(simulation.initialize(config)[0], schedule.attraction_points, schedule.repulsion_points)
+        elif order == 'close':
+            break
+
+    schedule.stop()
+    if pool is not None:
+        pool.close()
+    frames.close()
+    control.close()
+
+
+class SimulationProcess:
+    """
+    The class that runs the simulation in a process of its own, which hands its frames over in shared memory.
+
+    :param config: parameters of the simulation, defaults to the values in :py:mod:`parameters`.
+    :type config: :class:`parameters.Config`, optional
+    :param seed: seed used to generate the initial state, defaults to None (not reproducible).
+    :type seed: int, optional
+    :param substeps: number of steps per frame, defaults to 1.
+    :type substeps: int, optional
+    :param workers: number of threads that run every step, defaults to 1.
+    :type workers: int, optional
+    :param slots: number of frames in the ring of shared memory, defaults to twice the number of steps per frame plus one,
+                  so a frame given by :meth:`latest` is not written again while the next one is being simulated.
+    :type slots: int, optional
+
+    |
+    """
+
+    def __init__(self, config=None, seed: int = None, substeps: int = 1, workers: int = 1, slots: int = None):
+        """
+        Constructor for the simulation process class. Creates the frame buffer and starts the process.
+
+        |
+        """
+
+        config = config or param.Config()
+        if slots is None:
+            slots = 2*substeps + 1
+        # Sizes of the state that the process generates (see initialize_birds.generateState)
+        counts = (config.NUM_BIRDS, len(config.ATTRACTION_POINTS), len(config.REPULSION_POINTS))
+        self.frames = FrameBuffer.create(config.DIM, counts, slots=slots)
+
+        self.control, control = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=run, name='simulation', daemon=True,
+                                               args=(self.frames.name, config, seed, substeps, workers, control))
+        self.process.start()
+
+
+    def latest(self):
+        """
+        Gives the last complete frame (see :meth:`FrameBuffer.latest`).
+
+        |
+        """
+
+        return self.frames.latest()
+
+
+    def valid(self, number: int):
+        """
+        Checks whether a frame given by :meth:`latest` has not been overwritten (see :meth:`FrameBuffer.valid`).
+
+        |
+        """
+
+        return self.frames.valid(number)
+
+
+    def read(self):
+        """
+        Gives a copy of the last complete frame (see :meth:`FrameBuffer.read`).
+
+        |
+        """
+
+        return self.frames.read()
+
+
+    def reset(self):
+        """
+        Replaces the birds by new ones, keeping the attraction and repulsion points.
+
+        |
+        """
+
+        self.control.send('reset')
+
+
+    def close(self):
+        """
+        Stops the process and removes the frame buffer.
+
+        |
+        """
+
+        if self.process is None:
+            return
+        self.control.send('close')
+        self.process.join()
+        self.process = None
+        self.frames.close()
+        self.frames.unlink()
@@ -0,0 +1,185 @@
+"""
+.. module:: simulation
+
+Headless execution of the simulation, without any window or graphics.
+It runs the same steps as :func:`main.main`, as fast as the computer allows.
+
+It can also be executed from the command line, for example::
+
+    python simulation.py --steps 1000 --set NUM_BIRDS=10000 --set W_VIEW=2
+"""
+
+import parameters as param
+import flock
+import initialize_birds
+import recording
+import profiling
+import checkpoint
+import metrics
+import parallel
+
+import argparse
+import ast
+import time
+
+
+def initialize(config, seed: int = None, run_id: int = 0):
+    """
+    Generates the birds, attraction points and repulsion points of a new simulation (see :func:`initialize_birds.generateState`).
+
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :param seed: seed used to generate the initial positions and velocities, defaults to None (not reproducible).
+    :type seed: int, optional
+    :param run_id: number of the run, so that runs with the same seed get different initial states, defaults to 0.
+    :type run_id: int, optional
+    :return: the birds, the attraction points and the repulsion points, as instances of the class :class:`flock.Flock`.
+    :rtype: tuple
+
+    |
+    """
+
+    return initialize_birds.generateState(config, seed, run_id)
+
+
+def simulate(n_steps: int, params=None, seed: int = None, record: str = None, profiler=profiling.NULL, run_id: int = 0,
+             checkpoint_path: str = None, checkpoint_every: int = 0, resume: str = None, metrics_stage=None, pool=None):
+    """
+    Runs the simulation for a number of steps, without showing it.
+
+    :param n_steps: number of steps to run (counting the ones run before the checkpoint, when the simulation is resumed).
+    :type n_steps: int
+    :param params: parameters of the simulation, or the values of the parameters that are different from the ones in :py:mod:`parameters` (by name), defaults to None.
+    :type params: :class:`parameters.Config` or dict, optional
+    :param seed: seed used to generate the initial positions and velocities, defaults to None (not reproducible).
+    :type seed: int, optional
+    :param record: path of a file where every frame is recorded (see :py:mod:`recording`), defaults to None (not recorded).
+    :type record: str, optional
+    :param profiler: profiler of the phases of every step, defaults to :py:data:`profiling.NULL` (not measured).
+    :type profiler: :class:`profiling.Profiler`, optional
+    :param run_id: number of the run, so that runs with the same seed get different initial states, defaults to 0.
+    :type run_id: int, optional
+    :param checkpoint_path: path of a file where the state of the simulation is saved (see :py:mod:`checkpoint`), after the last step, defaults to None (not saved).
+    :type checkpoint_path: str, optional
+    :param checkpoint_every: number of steps between checkpoints, defaults to 0 (only after the last step).
+    :type checkpoint_every: int, optional
+    :param resume: path of a checkpoint from which the simulation is resumed, instead of starting it, defaults to None. Its parameters are used instead of the given ones.
+    :type resume: str, optional
+    :param metrics_stage: stage to which the state is sent after every step (see :func:`metrics.stage`), defaults to None.
+    :type metrics_stage: generator, optional
+    :param pool: pool of threads that runs every step, defaults to None (steps run on a single thread).
+    :type pool: :class:`parallel.Pool`, optional
+    :return: the birds, the attraction points and the repulsion points after the last step, as instances of the class :class:`flock.Flock`.
+    :rtype: tuple
+
+    |
+    """
+
+    if resume is not None:
+        birds, attraction_points, repulsion_points, config, step, rng, metadata = checkpoint.load(resume)
+    else:
+        config = params if isinstance(params, param.Config) else param.Config(**(params or {}))
+        rng = initialize_birds.generator(seed, run_id)
+        birds, attraction_points, repulsion_points = initialize_birds.generateState(config, rng=rng)
+        step = 0
+
+    recorder = None
+    if record is not None:
+        recorder = recording.Recorder(record, birds, attraction_points, repulsion_points)
+        recorder.record(birds, attraction_points, repulsion_points)
+
+    while step < n_steps:
+        if pool is not None:
+            pool.step(birds, attraction_points, repulsion_points, config, profiler)
+        else:
+            flock.step(birds, attraction_points, repulsion_points, config, profiler)
+        step += 1
+        if recorder is not None:
+            with profiler.phase('record'):
+                recorder.record(birds, attraction_points, repulsion_points)
+        if metrics_stage is not None:
+            with profiler.phase('metrics'):
+                metrics_stage.send((step, birds, attraction_points, repulsion_points, config))
+        if checkpoint_path is not None and checkpoint_every and step % checkpoint_every == 0 and step < n_steps:
+            with profiler.phase('checkpoint'):
+                checkpoint.save(checkpoint_path, birds, attraction_points, repulsion_points, config, step, rng)
+        profiler.endFrame()
+
+    if recorder is not None:
+        recorder.close()
+    if checkpoint_path is not None:
+        checkpoint.save(checkpoint_path, birds, attraction_points, repulsion_points, config, step, rng)
+
+    return birds, attraction_points, repulsion_points
+
+
+def parse_value(text):
+    """
+    Reads the value of a parameter written in the command line.
+
+    :param text: assignment of the form NAME=VALUE, where VALUE is a Python literal.
+    :type text: str
+    :return: the name and the value.
+    :rtype: tuple
+
+    |
+    """
+
+    name, _, value = text.partition('=')
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        raise argparse.ArgumentTypeError('invalid value for {}: {}'.format(name, value))
+
+
+def run():
+    """
+    Runs the simulation from the command line, and prints how long it took.
+
+    |
+    """
+
+    parser = argparse.ArgumentParser(description='Run the bird flock simulation without graphics.')
+    parser.add_argument('--steps', type=int, default=1000, help='number of steps to run')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the initial state')
+    parser.add_argument('--record', default=None, metavar='PATH', help='file where every frame is recorded')
+    parser.add_argument('--profile', default=None, metavar='PATH',
+                        help='CSV or JSON file where the time of every phase of the steps is written')
+    parser.add_argument('--checkpoint', default=None, metavar='PATH', help='file where the state of the simulation is saved')
+    parser.add_argument('--checkpoint-every', type=int, default=0, metavar='N', help='number of steps between checkpoints')
+    parser.add_argument('--resume', default=None, metavar='PATH', help='checkpoint from which the simulation is resumed')
+    parser.add_argument('--metrics', type=argparse.FileType('w'), default=None, metavar='PATH',
+                        help='CSV (or .jsonl) file where metrics of the flock are written, - for the standard output')
+    parser.add_argument('--metrics-every', type=int, default=1, metavar='K', help='number of steps between metrics')
+    parser.add_argument('--workers', type=int, default=1, metavar='N', help='number of threads that run every step')
+    parser.add_argument('--set', type=parse_value, action='append', default=[], metavar='NAME=VALUE',
+                        help='value of a parameter of parameters.py (can be repeated)')
+    args = parser.parse_args()
+
+    try:
+        config = param.Config(**dict(args.set))
+    except ValueError as error:
+        parser.error(str(error))
+
+    profiler = profiling.Profiler(window=max(args.steps, 1)) if args.profile is not None else profiling.NULL
+    metrics_stage = metrics.stage(args.metrics, args.metrics_every) if args.metrics is not None else None
+    pool = parallel.Pool(args.workers) if args.workers > 1 else None
+
+    start = time.perf_counter()
+    birds, attraction_points, repulsion_points = simulate(args.steps, config, args.seed, args.record, profiler,
+                                                          checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                                                          resume=args.resume, metrics_stage=metrics_stage, pool=pool)
+    elapsed = time.perf_counter() - start
+    if pool is not None:
+        pool.close()
+    if metrics_stage is not None:
+        metrics_stage.close()
+
+    print('{} birds, {} steps in {:.3f} s ({:.1f} steps/s)'.format(len(birds), args.steps, elapsed, args.steps/elapsed))
+    if args.profile is not None:
+        profiler.write(args.profile)
+        print('\n'.join(profiler.lines()))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,223 @@
+"""
+.. module:: sweep
+
+Parameter sweeps: many headless simulations (see :py:mod:`simulation`) with different parameters, run in parallel processes.
+The results of every run are written as a row of a CSV table as soon as it finishes.
+
+It can also be executed from the command line, for example::
+
+    python sweep.py --steps 500 --grid W_VIEW=0,1,2 --grid MU=0.05,0.1 --out results.csv
+    python sweep.py --steps 500 --sample 100 --range W_COPY=0:20 --range W_AVOIDANCE=0:20
+"""
+
+import parameters as param
+import flock
+import simulation
+
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import sys
+import time
+
+import numpy as np
+
+
+def grid(values: dict):
+    """
+    Builds all the combinations of some values of the parameters.
+
+    :param values: the values that every parameter takes, by name.
+    :type values: dict
+    :return: sets of values of the parameters, as dictionaries.
+    :rtype: list
+
+    |
+    """
+
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[name] for name in names))]
+
+
+def sample(n: int, ranges: dict, seed: int = 0):
+    """
+    Picks random values of the parameters, uniformly distributed.
+
+    :param n: number of sets of values.
+    :type n: int
+    :param ranges: the lowest and highest value of every parameter, by name.
+    :type ranges: dict
+    :param seed: seed of the random values, defaults to 0.
+    :type seed: int, optional
+    :return: sets of values of the parameters, as dictionaries.
+    :rtype: list
+
+    |
+    """
+
+    rng = np.random.default_rng(seed)
+    columns = {name: rng.uniform(low, high, n) for name, (low, high) in ranges.items()}
+    return [{name: float(column[k]) for name, column in columns.items()} for k in range(n)]
+
+
+def summary(birds, config):
+    """
+    Computes some values that describe the state of the birds at the end of a run.
+    Group mates are searched at the final positions (see :meth:`flock.Flock.groupMates`), so it also works for runs without steps.
+
+    :param birds: the birds of the simulation.
+    :type birds: :class:`flock.Flock`
+    :param config: parameters of the simulation.
+    :type config: :class:`parameters.Config`
+    :return: polarization (module of the average direction), average speed, average distance to the center of the birds and average number of group mates.
+    :rtype: dict
+
+    |
+    """
+
+    return {
+        'polarization': float(np.linalg.norm(birds.direction.mean(axis=0))),
+        'mean_speed': float(birds.speed.mean()),
+        'spread': float(flock.norm(birds.position - birds.position.mean(axis=0)).mean()),
+        'mean_group_size': float(birds.groupMates(config).counts().mean()) if len(birds) else float('nan'),
+    }
+
+
+def run(run_id: int, values: dict, n_steps: int, seed: int):
+    """
+    Runs one simulation of a sweep. It is executed in a worker process.
+
+    :param run_id: number of the run.
+    :type run_id: int
+    :param values: values of the parameters that are different from the ones in :py:mod:`parameters`, by name.
+    :type values: dict
+    :param n_steps: number of steps to run.
+    :type n_steps: int
+    :param seed: seed of the sweep, which gives the initial state of the run together with its number (see :func:`initialize_birds.generateState`).
+    :type seed: int
+    :return: row of the results table: number of the run, values of the parameters, summary of the final state (see :func:`summary`) and time spent.
+    :rtype: dict
+
+    |
+    """
+
+    start = time.perf_counter()
+    config = param.Config(**values)
+    birds, attraction_points, repulsion_points = simulation.simulate(n_steps, config, seed, run_id=run_id)
+
+    return {'run_id': run_id, **values, **summary(birds, config), 'seconds': time.perf_counter() - start}
+
+
+def sweep(param_sets: list, n_steps: int, seed: int = 0, workers: int = None, out=None):
+    """
+    Runs one simulation for every set of values of the parameters, in parallel processes.
+
+    :param param_sets: values of the parameters that are different from the ones in :py:mod:`parameters` in every run, as dictionaries (see :func:`grid` and :func:`sample`).
+    :type param_sets: list
+    :param n_steps: number of steps of every run.
+    :type n_steps: int
+    :param seed: seed of the sweep, from which the seed of every run is derived, defaults to 0.
+    :type seed: int, optional
+    :param workers: number of processes, defaults to the number of processors.
+    :type workers: int, optional
+    :param out: file where the results table is written as CSV while the runs finish, defaults to None (not written).
+    :type out: file, optional
+    :return: rows of the results table (see :func:`run`), sorted by run.
+    :rtype: list
+
+    |
+    """
+
+    # Check the parameters before starting any process
+    for values in param_sets:
+        param.Config(**values)
+
+    names = list(dict.fromkeys(name for values in param_sets for name in values))
+    writer = None
+    if out is not None:
+        writer = csv.DictWriter(out, ['run_id'] + names + ['polarization', 'mean_speed', 'spread', 'mean_group_size', 'seconds'])
+        writer.writeheader()
+
+    rows = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, run_id, values, n_steps, seed) for run_id, values in enumerate(param_sets)]
+
+        for future in concurrent.futures.as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            if writer is not None:
+                writer.writerow(row)
+                out.flush()
+
+    return sorted(rows, key=lambda row: row['run_id'])
+
+
+def parse_list(text):
+    """
+    Reads the values of a parameter written in the command line.
+
+    :param text: assignment of the form NAME=VALUE,VALUE,...
+    :type text: str
+    :return: the name and the values.
+    :rtype: tuple
+
+    |
+    """
+
+    name, values = simulation.parse_value(text)
+    return name, list(values) if isinstance(values, tuple) else [values]
+
+
+def parse_range(text):
+    """
+    Reads the range of values of a parameter written in the command line.
+
+    :param text: assignment of the form NAME=LOW:HIGH.
+    :type text: str
+    :return: the name and the lowest and highest values.
+    :rtype: tuple
+
+    |
+    """
+
+    name, _, value = text.partition('=')
+    try:
+        low, high = (float(limit) for limit in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid range for {}: {}'.format(name, value))
+    return name, (low, high)
+
+
+def main():
+    """
+    Runs a sweep from the command line.
+
+    |
+    """
+
+    parser = argparse.ArgumentParser(description='Run the bird flock simulation for many values of the parameters.')
+    parser.add_argument('--steps', type=int, default=500, help='number of steps of every run')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the sweep')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes')
+    parser.add_argument('--grid', type=parse_list, action='append', default=[], metavar='NAME=VALUE,VALUE,...',
+                        help='values of a parameter, combined with the values of the rest (can be repeated)')
+    parser.add_argument('--sample', type=int, default=None, metavar='N', help='number of random sets of values')
+    parser.add_argument('--range', type=parse_range, action='append', default=[], metavar='NAME=LOW:HIGH',
+                        help='range of the random values of a parameter (can be repeated)')
+    parser.add_argument('--out', type=argparse.FileType('w'), default=sys.stdout, help='CSV file for the results')
+    args = parser.parse_args()
+
+    if args.sample is not None:
+        param_sets = sample(args.sample, dict(args.range), args.seed)
+    else:
+        param_sets = grid(dict(args.grid))
+
+    try:
+        sweep(param_sets, args.steps, args.seed, args.workers, args.out)
+    except ValueError as error:
+        parser.error(str(error))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+.. module:: test_kernels
+
+Tests that the rules of :py:mod:`kernels` and of :py:mod:`flock` give the same results as the methods of :class:`bird.Bird`, run with ``python -m pytest``.
+"""
+
+import parameters as param
+import kernels
+
+import pytest
+
+
+def config(dim: int):
+    """
+    Builds a configuration of the given dimension, with points of that dimension.
+
+    :param dim: dimension of the simulation.
+    :type dim: int
+    :return: the configuration.
+    :rtype: :class:`parameters.Config`
+
+    |
+    """
+
+    return param.Config(DIM=dim, ATTRACTION_POINTS=[(200, 100, 200)[:dim]], REPULSION_POINTS=[(0, 0, 0)[:dim]])
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+@pytest.mark.parametrize('dim', [2, 3])
+def test_rules_match_birds(dim, compiled):
+    errors = kernels.check(n=200, seed=dim, compiled=compiled, config=config(dim))
+    assert set(errors) == {'avoidance', 'center', 'copy', 'view'}
+    assert max(errors.values()) < 1e-9
+
+
+@pytest.mark.parametrize('dim', [2, 3])
+def test_check_keeps_parameters(dim):
+    before = param.Config()
+    kernels.check(n=20, config=config(dim))
+    assert param.Config().values() == before.values()